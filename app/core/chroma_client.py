@@ -0,0 +1,76 @@
+import logging
+import time
+from functools import lru_cache
+
+import chromadb
+import httpx
+from chromadb.config import Settings as ChromaSettings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHROMA_MODES = ("persistent", "http")
+
+
+def _retry(fn, retry_on, *args, **kwargs):
+    attempts = settings.CHROMA_HTTP_RETRIES + 1
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = settings.CHROMA_HTTP_RETRY_BACKOFF * (2 ** attempt)
+            logger.warning(
+                f"Chroma request failed ({e.__class__.__name__}: {e}); retrying in {delay:.2f}s "
+                f"({attempt + 1}/{attempts - 1})..."
+            )
+            time.sleep(delay)
+
+
+def call_with_retries(fn, *args, **kwargs):
+    """
+    Call a vector store operation, retrying transient connection failures to the Chroma
+    server with exponential backoff. Embedded (persistent) mode never raises these.
+    """
+    return _retry(fn, httpx.TransportError, *args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_chroma_client() -> chromadb.ClientAPI:
+    """
+    Return the process-wide Chroma client for the configured backend.
+
+    "persistent" opens the on-disk store in CHROMA_DB_DIR inside this process (one process
+    only). "http" talks to a Chroma server over a pooled keep-alive connection, so several
+    API and ingestion workers can share one store.
+    """
+    if settings.CHROMA_MODE not in CHROMA_MODES:
+        raise ValueError(
+            f"Unsupported CHROMA_MODE '{settings.CHROMA_MODE}', expected one of {CHROMA_MODES}"
+        )
+
+    if settings.CHROMA_MODE == "persistent":
+        logger.info(f"Connecting to ChromaDB persistent client at {settings.CHROMA_DB_DIR}...")
+        return chromadb.PersistentClient(path=settings.CHROMA_DB_DIR)
+
+    logger.info(
+        f"Connecting to ChromaDB server at {settings.CHROMA_HOST}:{settings.CHROMA_PORT} "
+        f"(pool size {settings.CHROMA_HTTP_POOL_SIZE})..."
+    )
+    client_settings = ChromaSettings(
+        chroma_http_max_connections=settings.CHROMA_HTTP_POOL_SIZE,
+        chroma_http_max_keepalive_connections=settings.CHROMA_HTTP_POOL_SIZE,
+        chroma_http_keepalive_secs=settings.CHROMA_HTTP_KEEPALIVE_SECS,
+    )
+    # The client checks the tenant/database on creation and reports a refused connection
+    # as ValueError, so retry both while the server starts up
+    return _retry(
+        chromadb.HttpClient,
+        (httpx.TransportError, ValueError),
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        ssl=settings.CHROMA_SSL,
+        settings=client_settings,
+    )
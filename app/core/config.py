@@ -12,8 +12,64 @@ class Settings:
     GOOGLE_API_KEY: Optional[str] = os.getenv("GOOGLE_API_KEY")
     USER_AGENT: str = os.getenv("USER_AGENT", "Mozilla/5.0")
     CHROMA_DB_DIR: str = os.getenv("CHROMA_DB_DIR", "./chroma_db")
+    # "persistent" embeds Chroma in this process; "http" connects to a shared Chroma server
+    CHROMA_MODE: str = os.getenv("CHROMA_MODE", "persistent")
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "localhost")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8001"))
+    CHROMA_SSL: bool = os.getenv("CHROMA_SSL", "false").lower() == "true"
+    CHROMA_HTTP_POOL_SIZE: int = int(os.getenv("CHROMA_HTTP_POOL_SIZE", "32"))
+    CHROMA_HTTP_KEEPALIVE_SECS: float = float(os.getenv("CHROMA_HTTP_KEEPALIVE_SECS", "40"))
+    CHROMA_HTTP_RETRIES: int = int(os.getenv("CHROMA_HTTP_RETRIES", "3"))
+    CHROMA_HTTP_RETRY_BACKOFF: float = float(os.getenv("CHROMA_HTTP_RETRY_BACKOFF", "0.5"))
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
     COLLECTION_NAME: str = os.getenv("COLLECTION_NAME", "modular_rag")
     MODEL_NAME: str = os.getenv("MODEL_NAME", "gpt-4o-mini")
+    # Maximum number of chunks/frames embedded and written per vector store call
+    VECTOR_WRITE_BATCH_SIZE: int = int(os.getenv("VECTOR_WRITE_BATCH_SIZE", "256"))
+    SOURCE_REGISTRY_PATH: str = os.getenv(
+        "SOURCE_REGISTRY_PATH", os.path.join(CHROMA_DB_DIR, "source_registry.sqlite3")
+    )
+    FRAMES_DIR: str = os.getenv("FRAMES_DIR", "./extracted_frames")
+    # Compact frame index: "none" keeps float32 frames in Chroma, "int8" or "binary"
+    # stores quantized codes in a memory-mapped index with exact float rescoring.
+    FRAME_INDEX_QUANTIZATION: str = os.getenv("FRAME_INDEX_QUANTIZATION", "none")
+    FRAME_INDEX_DIR: str = os.getenv(
+        "FRAME_INDEX_DIR", os.path.join(CHROMA_DB_DIR, "frame_index")
+    )
+    # Shortlist size multiplier for rescoring; defaults to 8 for int8 and 128 for binary
+    FRAME_INDEX_RERANK_FACTOR: Optional[int] = (
+        int(os.getenv("FRAME_INDEX_RERANK_FACTOR")) if os.getenv("FRAME_INDEX_RERANK_FACTOR") else None
+    )
+    # Text embedding backend for a fresh collection: "openai", "local" (CPU, all-MiniLM-L6-v2)
+    # or "hashing". Existing collections keep their backend until migrated
+    # with `python -m app.core.embedding_migration`.
+    TEXT_EMBEDDING_BACKEND: str = os.getenv("TEXT_EMBEDDING_BACKEND", "openai")
+    TEXT_EMBEDDING_MODEL: Optional[str] = os.getenv("TEXT_EMBEDDING_MODEL")
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "./model_cache")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "4"))
+    HASHING_EMBEDDING_DIM: int = int(os.getenv("HASHING_EMBEDDING_DIM", "384"))
+    # Speculative pre-retrieval: branches ("text", "frames", "web") started as soon as a
+    # chat message arrives; finished results are handed to the agent's first turn
+    PRERETRIEVAL_BRANCHES: str = os.getenv("PRERETRIEVAL_BRANCHES", "text,frames")
+    PRERETRIEVAL_TIMEOUT_S: float = float(os.getenv("PRERETRIEVAL_TIMEOUT_S", "2.0"))
+    # /chat/batch: agent runs in flight at once, and the largest batch accepted
+    CHAT_BATCH_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+    CHAT_BATCH_MAX_MESSAGES: int = int(os.getenv("CHAT_BATCH_MAX_MESSAGES", "500"))
+    WEB_SEARCH_CACHE_TTL_S: float = float(os.getenv("WEB_SEARCH_CACHE_TTL_S", "300"))
+    WEB_SEARCH_CACHE_SIZE: int = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "256"))
+    # Drop text chunks that nearly duplicate an already stored chunk (MinHash/LSH) before
+    # they are embedded; DEDUP_THRESHOLD is the estimated Jaccard similarity of word 5-grams
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+    # On-demand request profiling (X-Profile header or POST /profiles/arm)
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_MAX_PER_MINUTE: int = int(os.getenv("PROFILE_MAX_PER_MINUTE", "2"))
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+    PROFILE_MAX_STORED: int = int(os.getenv("PROFILE_MAX_STORED", "50"))
+    # Profiling is disabled while unset; when set, X-Profile, /profiles/arm and the /profiles endpoints require a matching X-Admin-Token header
+    PROFILE_ADMIN_TOKEN: Optional[str] = os.getenv("PROFILE_ADMIN_TOKEN")
 
 
 settings = Settings()
@@ -0,0 +1,335 @@
+"""
+Near-duplicate chunk detection with MinHash signatures and banded LSH.
+
+Chunks are shingled into word 5-grams and summarised by a 128-value MinHash signature.
+The signature is cut into 16 bands of 8 rows, and two chunks become candidates when any
+band matches. Candidates count as duplicates when their estimated Jaccard similarity
+reaches DEDUP_THRESHOLD.
+
+Signatures and band buckets are stored in the source registry database, next to the
+item IDs they describe. Chunks dropped as duplicates of another source's chunk are kept
+in a side table, so they can be restored if that chunk is ever deleted.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.config import settings
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+class MinHasher:
+    """
+    MinHash over hashed word shingles using universal hashing `(a * x + b) mod p`.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a, b < 2^31 and x < 2^32 keep a * x + b inside uint64
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        words = _WORD_PATTERN.findall(text.lower())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+
+class DedupBatch:
+    """
+    Signatures and duplicates decided for a batch of sources, written to the index only
+    after the chunks themselves were stored.
+    """
+
+    def __init__(self):
+        self.signatures: Dict[str, Dict[str, np.ndarray]] = {}
+        self.duplicates: Dict[str, List[Tuple[str, str, Document]]] = {}
+        self.replace: Dict[str, bool] = {}
+        self.buckets: Dict[Tuple[int, int], List[Tuple[str, str, np.ndarray]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return sum(len(duplicates) for duplicates in self.duplicates.values())
+
+
+class NearDuplicateIndex:
+    """
+    Persistent LSH index over the MinHash signatures of stored text chunks.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.db_path = db_path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dedup_signatures (
+                    item_id TEXT PRIMARY KEY,
+                    source_id TEXT NOT NULL,
+                    signature BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dedup_signatures_source ON dedup_signatures (source_id)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dedup_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    item_id TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dedup_buckets_key ON dedup_buckets (band, bucket)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dedup_buckets_item ON dedup_buckets (item_id)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dedup_duplicates (
+                    item_id TEXT PRIMARY KEY,
+                    source_id TEXT NOT NULL,
+                    duplicate_of TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dedup_duplicates_of ON dedup_duplicates (duplicate_of)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS dedup_duplicates_source ON dedup_duplicates (source_id)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(
+                signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8
+            ).digest()
+            keys.append((band, int.from_bytes(digest, "little", signed=True)))
+        return keys
+
+    def _similarity(self, a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.count_nonzero(a == b)) / len(a)
+
+    def _best_match(self, signature, candidates) -> Optional[str]:
+        best_id, best_score = None, self.threshold
+        for item_id, other in candidates:
+            score = self._similarity(signature, other)
+            if score >= best_score:
+                best_id, best_score = item_id, score
+        return best_id
+
+    def _stored_candidates(self, conn, keys, exclude_source: Optional[str]):
+        # One equality lookup per band, so every branch is a search on dedup_buckets_key
+        # (a row-value IN list makes SQLite scan the whole bucket table instead)
+        lookups = " UNION ".join(
+            "SELECT item_id FROM dedup_buckets WHERE band = ? AND bucket = ?" for _ in keys
+        )
+        rows = conn.execute(
+            f"""
+            SELECT s.item_id, s.source_id, s.signature
+            FROM dedup_signatures s
+            WHERE s.item_id IN ({lookups})
+            """,
+            [value for key in keys for value in key],
+        ).fetchall()
+        return [
+            (item_id, np.frombuffer(signature, dtype=np.uint64))
+            for item_id, source_id, signature in rows
+            if source_id != exclude_source
+        ]
+
+    def deduplicate(
+        self,
+        source_id: str,
+        items: Dict[str, Document],
+        batch: DedupBatch,
+        replace: bool = True,
+    ) -> Dict[str, Document]:
+        """
+        Return the chunks of `source_id` worth embedding. Near duplicates within the source
+        are dropped; near duplicates of another source's stored (or batched) chunk are
+        recorded in `batch` so they can be restored later.
+        With `replace`, the source's own stored chunks are ignored since they are about to be
+        replaced; otherwise the chunks are added to what the source already has.
+        """
+        kept: Dict[str, Document] = {}
+        signatures: Dict[str, np.ndarray] = {}
+        duplicates: List[Tuple[str, str, Document]] = []
+        local_buckets: Dict[Tuple[int, int], List[Tuple[str, np.ndarray]]] = defaultdict(list)
+        with self._connect() as conn:
+            for item_id, doc in items.items():
+                signature = self.hasher.signature(doc.page_content)
+                if signature is None:
+                    kept[item_id] = doc
+                    continue
+                keys = self._band_keys(signature)
+
+                local = {cid: sig for key in keys for cid, sig in local_buckets.get(key, ())}
+                if self._best_match(signature, local.items()) is not None:
+                    continue
+
+                others = {
+                    cid: sig
+                    for key in keys
+                    for cid, sid, sig in batch.buckets.get(key, ())
+                    if sid != source_id
+                }
+                others.update(
+                    self._stored_candidates(conn, keys, source_id if replace else None)
+                )
+                match = self._best_match(signature, others.items())
+                if match is not None:
+                    duplicates.append((item_id, match, doc))
+                    continue
+
+                kept[item_id] = doc
+                signatures[item_id] = signature
+                for key in keys:
+                    local_buckets[key].append((item_id, signature))
+
+        batch.signatures[source_id] = {**batch.signatures.get(source_id, {}), **signatures}
+        batch.duplicates[source_id] = batch.duplicates.get(source_id, []) + duplicates
+        batch.replace[source_id] = replace
+        for item_id, signature in signatures.items():
+            for key in self._band_keys(signature):
+                batch.buckets[key].append((item_id, source_id, signature))
+        return kept
+
+    def commit(self, batch: DedupBatch) -> List[Tuple[str, str, Document]]:
+        """
+        Store a batch once its chunks are written. Returns recorded duplicates whose
+        original chunk no longer exists (it went stale on re-index); they need restoring.
+        """
+        with self._lock, self._connect() as conn:
+            for source_id, signatures in batch.signatures.items():
+                if batch.replace[source_id]:
+                    self._delete_source_rows(conn, source_id)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dedup_signatures (item_id, source_id, signature) VALUES (?, ?, ?)",
+                    [(item_id, source_id, sig.tobytes()) for item_id, sig in signatures.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO dedup_buckets (band, bucket, item_id) VALUES (?, ?, ?)",
+                    [
+                        (band, bucket, item_id)
+                        for item_id, sig in signatures.items()
+                        for band, bucket in self._band_keys(sig)
+                    ],
+                )
+                conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO dedup_duplicates
+                        (item_id, source_id, duplicate_of, document, metadata)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (item_id, source_id, duplicate_of, doc.page_content, json.dumps(doc.metadata))
+                        for item_id, duplicate_of, doc in batch.duplicates.get(source_id, [])
+                    ],
+                )
+            return self._pop_orphans(conn)
+
+    def remove_source(self, source_id: str) -> List[Tuple[str, str, Document]]:
+        """
+        Forget a deleted source. Returns the other sources' duplicates that pointed at its
+        chunks; they need restoring.
+        """
+        with self._lock, self._connect() as conn:
+            self._delete_source_rows(conn, source_id)
+            return self._pop_orphans(conn)
+
+    @staticmethod
+    def _delete_source_rows(conn, source_id: str):
+        conn.execute(
+            """
+            DELETE FROM dedup_buckets WHERE item_id IN
+                (SELECT item_id FROM dedup_signatures WHERE source_id = ?)
+            """,
+            (source_id,),
+        )
+        conn.execute("DELETE FROM dedup_signatures WHERE source_id = ?", (source_id,))
+        conn.execute("DELETE FROM dedup_duplicates WHERE source_id = ?", (source_id,))
+
+    @staticmethod
+    def _pop_orphans(conn) -> List[Tuple[str, str, Document]]:
+        rows = conn.execute(
+            """
+            SELECT item_id, source_id, document, metadata FROM dedup_duplicates
+            WHERE duplicate_of NOT IN (SELECT item_id FROM dedup_signatures)
+            """
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "DELETE FROM dedup_duplicates WHERE item_id = ?", [(row[0],) for row in rows]
+            )
+        return [
+            (item_id, source_id, Document(page_content=document, metadata=json.loads(metadata)))
+            for item_id, source_id, document, metadata in rows
+        ]
+
+    def duplicate_counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT source_id, COUNT(*) FROM dedup_duplicates GROUP BY source_id"
+            ).fetchall()
+        return dict(rows)
+
+
+# Lives in the source registry database so snapshots and backups carry it along
+near_duplicate_index = NearDuplicateIndex(
+    settings.SOURCE_REGISTRY_PATH, threshold=settings.DEDUP_THRESHOLD
+)
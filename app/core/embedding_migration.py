@@ -0,0 +1,250 @@
+"""
+Re-embed the text collection with another embedding backend while the API keeps serving.
+
+    python -m app.core.embedding_migration --backend local
+    python -m app.core.embedding_migration --status
+
+1. Every text write (in every worker) starts going to both the current and the new
+   collection.
+2. Existing chunks are copied page by page and re-embedded with the new backend. IDs,
+   documents and metadata are kept, so the source registry stays valid.
+3. The new collection is reconciled against the old one, fixing writes that raced the copy.
+4. The new collection becomes active. Workers switch queries within TEXT_STATE_REFRESH_S,
+   and writes keep reaching the old collection until they all have.
+
+The old collection is left in place, so switching back is just another migration.
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+from typing import List, Optional, Set
+
+from app.core.chroma_client import call_with_retries, get_chroma_client
+from app.core.config import settings
+from app.core.embeddings import (
+    TEXT_EMBEDDING_BACKENDS,
+    TEXT_STATE_REFRESH_S,
+    get_text_embeddings,
+    save_text_collection_state,
+    text_collection_state,
+)
+from app.core.metrics import LOG_FORMAT
+from app.core.source_registry import source_registry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOG_FORMAT,
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+RUNNING_STATUSES = ("copying", "reconciling", "switching")
+
+_background_lock = threading.Lock()
+
+
+def _status_key() -> str:
+    return f"text_embedding_migration:{settings.COLLECTION_NAME}"
+
+
+def migration_status() -> Optional[dict]:
+    return source_registry.get_meta(_status_key())
+
+
+def _set_status(record: dict, **changes):
+    record.update(changes)
+    source_registry.set_meta(_status_key(), record)
+
+
+def target_collection_name(backend: str, model: Optional[str] = None) -> str:
+    name = f"{settings.COLLECTION_NAME}__{backend}"
+    if model:
+        name = f"{name}_{re.sub(r'[^A-Za-z0-9]+', '-', model).strip('-')}"
+    return name
+
+
+def _all_ids(collection, page_size: int) -> Set[str]:
+    ids = set()
+    offset = 0
+    while True:
+        page = call_with_retries(collection.get, include=[], limit=page_size, offset=offset)
+        ids.update(page["ids"])
+        if len(page["ids"]) < page_size:
+            return ids
+        offset += page_size
+
+
+def _copy(page: dict, dest, embeddings) -> int:
+    rows = [
+        (item_id, document, metadata)
+        for item_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+        if document is not None
+    ]
+    if not rows:
+        return 0
+    ids, documents, metadatas = (list(column) for column in zip(*rows))
+    call_with_retries(
+        dest.upsert,
+        ids=ids,
+        embeddings=embeddings.embed_documents(documents),
+        documents=documents,
+        metadatas=metadatas if any(metadatas) else None,
+    )
+    return len(ids)
+
+
+def _copy_ids(ids: List[str], source, dest, embeddings, page_size: int) -> int:
+    copied = 0
+    for start in range(0, len(ids), page_size):
+        page = call_with_retries(
+            source.get, ids=ids[start:start + page_size], include=["documents", "metadatas"]
+        )
+        copied += _copy(page, dest, embeddings)
+    return copied
+
+
+def migrate(
+    backend: str,
+    model: Optional[str] = None,
+    page_size: int = 500,
+    grace_s: float = TEXT_STATE_REFRESH_S * 2,
+    force: bool = False,
+) -> dict:
+    """
+    Run a migration to `backend` to completion and return its final status.
+    """
+    status = migration_status()
+    if status and status.get("status") in RUNNING_STATUSES and not force:
+        raise RuntimeError(
+            f"A migration to '{status['target']}' is already {status['status']}; pass force=True "
+            f"if it was interrupted."
+        )
+    state = text_collection_state()
+    active = state["active"]
+    target = {"name": target_collection_name(backend, model), "backend": backend, "model": model}
+    if target["name"] == active["name"]:
+        raise ValueError(f"Collection '{active['name']}' already uses the {backend} backend.")
+
+    # Fails fast on an unknown backend, and loads a local model before writes are mirrored
+    embeddings = get_text_embeddings(backend, model)
+    embeddings.embed_query("warm up")
+
+    client = get_chroma_client()
+    source = call_with_retries(client.get_or_create_collection, name=active["name"], embedding_function=None)
+    dest = call_with_retries(
+        client.get_or_create_collection,
+        name=target["name"],
+        embedding_function=None,
+        metadata=source.metadata or None,
+    )
+
+    status = {
+        "status": "copying",
+        "source": active["name"],
+        "target": target["name"],
+        "backend": backend,
+        "model": model,
+        "total": call_with_retries(source.count),
+        "copied": 0,
+        "started_at": time.time(),
+        "finished_at": None,
+        "error": None,
+    }
+    _set_status(status)
+    logger.info(f"Migrating {status['total']} chunks from '{active['name']}' to '{target['name']}'...")
+    save_text_collection_state({"active": active, "mirror": target})
+
+    try:
+        offset = 0
+        while True:
+            page = call_with_retries(
+                source.get, include=["documents", "metadatas"], limit=page_size, offset=offset
+            )
+            copied = _copy(page, dest, embeddings)
+            _set_status(status, copied=status["copied"] + copied)
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+
+        # Offset paging is not a snapshot: entries written or deleted before every worker
+        # began mirroring can be missed or left behind, so diff the two ID sets once
+        _set_status(status, status="reconciling")
+        source_ids = _all_ids(source, page_size * 10)
+        dest_ids = _all_ids(dest, page_size * 10)
+        missing = sorted(source_ids - dest_ids)
+        extra = sorted(dest_ids - source_ids)
+        if missing:
+            _copy_ids(missing, source, dest, embeddings, page_size)
+        for start in range(0, len(extra), page_size):
+            call_with_retries(dest.delete, ids=extra[start:start + page_size])
+        logger.info(f"Reconciled {len(missing)} missing and {len(extra)} stale chunks.")
+    except Exception as e:
+        save_text_collection_state({"active": active, "mirror": None})
+        _set_status(status, status="failed", error=str(e), finished_at=time.time())
+        raise
+
+    # Switch queries to the new collection but keep writing to both until every
+    # worker has re-read the state
+    _set_status(status, status="switching")
+    save_text_collection_state({"active": target, "mirror": active})
+    time.sleep(grace_s)
+    save_text_collection_state({"active": target, "mirror": None})
+    _set_status(status, status="done", finished_at=time.time())
+    logger.info(
+        f"Text collection is now '{target['name']}' ({backend}). "
+        f"The old collection '{active['name']}' was kept."
+    )
+    return status
+
+
+def start_migration(backend: str, model: Optional[str] = None, force: bool = False) -> dict:
+    """
+    Run `migrate` in a background thread of this process and return its initial status.
+    """
+    status = migration_status()
+    if status and status.get("status") in RUNNING_STATUSES and not force:
+        raise RuntimeError(f"A migration to '{status['target']}' is already {status['status']}.")
+    if backend not in TEXT_EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown text embedding backend {backend!r}")
+    if not _background_lock.acquire(blocking=False):
+        raise RuntimeError("A migration is already starting in this process.")
+
+    def run():
+        try:
+            migrate(backend, model, force=force)
+        except Exception as e:
+            logger.exception(f"Embedding migration to {backend} failed: {e}")
+        finally:
+            _background_lock.release()
+
+    threading.Thread(target=run, name="embedding-migration", daemon=True).start()
+    return {
+        "status": "started",
+        "backend": backend,
+        "model": model,
+        "target": target_collection_name(backend, model),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--backend", help="Backend to re-embed with (openai, local, hashing).")
+    parser.add_argument("--model", help="Model name for the backend, if it takes one.")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--force", action="store_true", help="Restart an interrupted migration.")
+    parser.add_argument("--status", action="store_true", help="Show the active collection and last migration.")
+    args = parser.parse_args(argv)
+
+    if args.status or not args.backend:
+        print(json.dumps({"state": text_collection_state(), "migration": migration_status()}, indent=2))
+        return
+    print(json.dumps(migrate(args.backend, args.model, page_size=args.page_size, force=args.force), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Text embedding backends for the text/PDF collection.
+
+    openai   OpenAIEmbeddings (remote; TEXT_EMBEDDING_MODEL picks the model)
+    local    all-MiniLM-L6-v2 on CPU via onnxruntime, batched and thread-limited, with
+             the model cached under EMBEDDING_CACHE_DIR
+    hashing  deterministic feature hashing, no model at all (tests and benchmarks)
+
+A collection can only be queried with the backend it was embedded with, so the backend
+and collection in use are recorded in the source registry. Switching backends goes
+through `app.core.embedding_migration`, which re-embeds into a new collection.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.core.chroma_client import call_with_retries, get_chroma_client
+from app.core.config import settings
+from app.core.source_registry import source_registry
+
+logger = logging.getLogger(__name__)
+
+# What the text collection was embedded with before the backend became configurable:
+# OpenAIEmbeddings() with no model, which langchain-openai defaults to ada-002
+LEGACY_TEXT_EMBEDDING = {"backend": "openai", "model": "text-embedding-ada-002"}
+
+# How often a text store re-reads the active collection, so every worker picks up a
+# finished migration
+TEXT_STATE_REFRESH_S = 5.0
+
+TEXT_EMBEDDING_BACKENDS: Dict[str, Callable[[Optional[str]], Embeddings]] = {}
+
+
+def register_text_embedding_backend(name: str):
+    """
+    Register a factory `(model) -> Embeddings` under a backend name.
+    """
+
+    def decorator(factory):
+        TEXT_EMBEDDING_BACKENDS[name] = factory
+        return factory
+
+    return decorator
+
+
+def get_text_embeddings(backend: Optional[str] = None, model: Optional[str] = None) -> Embeddings:
+    backend = backend or settings.TEXT_EMBEDDING_BACKEND
+    if backend not in TEXT_EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown text embedding backend {backend!r}; expected one of {sorted(TEXT_EMBEDDING_BACKENDS)}"
+        )
+    return TEXT_EMBEDDING_BACKENDS[backend](model or None)
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words feature hashing. Costs microseconds instead of a model call,
+    but only matches on shared words.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalOnnxEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 sentence embeddings on CPU. Reuses the ONNX export that chromadb
+    ships a downloader for, but pads each batch only to its longest text and caps the
+    onnxruntime thread pool so embedding does not starve the API's other threads.
+    """
+
+    MODEL_NAME = "all-MiniLM-L6-v2"
+    MAX_TOKENS = 256
+
+    def __init__(self, cache_dir: str, batch_size: int = 64, threads: int = 4):
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.threads = threads
+        self._session = None
+        self._tokenizer = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        with self._load_lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+            from tokenizers import Tokenizer
+
+            downloader = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+            downloader.DOWNLOAD_PATH = os.path.join(self.cache_dir, self.MODEL_NAME)
+            logger.info(f"Loading {self.MODEL_NAME} from {downloader.DOWNLOAD_PATH}...")
+            # Downloads and verifies the model once; later starts read the cached copy
+            downloader._download_model_if_not_exists()
+            model_dir = os.path.join(downloader.DOWNLOAD_PATH, downloader.EXTRACTED_FOLDER_NAME)
+
+            tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.MAX_TOKENS)
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+            options = onnxruntime.SessionOptions()
+            options.log_severity_level = 3
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._tokenizer = tokenizer
+            self._session = onnxruntime.InferenceSession(
+                os.path.join(model_dir, "model.onnx"),
+                providers=["CPUExecutionProvider"],
+                sess_options=options,
+            )
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if self._session is None:
+            self._load()
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self._tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            hidden = self._session.run(
+                None,
+                {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "token_type_ids": np.zeros_like(input_ids),
+                },
+            )[0]
+            # Attention-weighted mean pooling, then L2 normalisation
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.extend(pooled.astype(np.float32).tolist())
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+@register_text_embedding_backend("openai")
+def _openai_backend(model: Optional[str]) -> Embeddings:
+    if model:
+        return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY, model=model)
+    return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+
+
+@register_text_embedding_backend("local")
+def _local_backend(model: Optional[str]) -> Embeddings:
+    if model and model != LocalOnnxEmbeddings.MODEL_NAME:
+        raise ValueError(f"The local backend only ships {LocalOnnxEmbeddings.MODEL_NAME}, not {model!r}")
+    return LocalOnnxEmbeddings(
+        settings.EMBEDDING_CACHE_DIR,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        threads=settings.EMBEDDING_THREADS,
+    )
+
+
+@register_text_embedding_backend("hashing")
+def _hashing_backend(model: Optional[str]) -> Embeddings:
+    return HashingEmbeddings(dim=settings.HASHING_EMBEDDING_DIM)
+
+
+# ---------------------------------------------------------------------------- active collection
+
+
+def _state_key() -> str:
+    return f"text_collection:{settings.COLLECTION_NAME}"
+
+
+def text_collection_state() -> dict:
+    """
+    The collection queries and writes go to (`active`), plus the collection every write is
+    mirrored to while a migration is running (`mirror`).
+
+    The first call records COLLECTION_NAME with the backend it holds: TEXT_EMBEDDING_BACKEND
+    for a new or empty collection, the legacy OpenAI embeddings for one that already has
+    chunks. After that only a migration changes it, so changing TEXT_EMBEDDING_BACKEND on
+    an existing collection is reported instead of silently mixing embedding spaces.
+    """
+    state = source_registry.get_meta(_state_key())
+    if state is None:
+        state = source_registry.setdefault_meta(_state_key(), _initial_text_collection_state())
+    return state
+
+
+def _initial_text_collection_state() -> dict:
+    collection = call_with_retries(
+        get_chroma_client().get_or_create_collection, name=settings.COLLECTION_NAME, embedding_function=None
+    )
+    if collection.count():
+        logger.info(
+            f"Collection '{settings.COLLECTION_NAME}' has no recorded embedding backend; "
+            f"assuming the legacy {LEGACY_TEXT_EMBEDDING['backend']} embeddings."
+        )
+        active = {"name": settings.COLLECTION_NAME, **LEGACY_TEXT_EMBEDDING}
+    else:
+        active = {
+            "name": settings.COLLECTION_NAME,
+            "backend": settings.TEXT_EMBEDDING_BACKEND,
+            "model": settings.TEXT_EMBEDDING_MODEL,
+        }
+    return {"active": active, "mirror": None}
+
+
+def save_text_collection_state(state: dict):
+    source_registry.set_meta(_state_key(), state)
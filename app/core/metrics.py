@@ -0,0 +1,324 @@
+import bisect
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - trace_id=%(trace_id)s - %(message)s'
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_trace_id: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+class StageSink:
+    """
+    Receiver of the stages run on behalf of one request (see app.core.profiling).
+    `enter_thread` / `exit_thread` bracket every stage on the thread that runs it, so
+    the receiver knows which threads are working for the request at any moment.
+    """
+
+    def add_stage(self, component: str, operation: str, seconds: float):
+        pass
+
+    def enter_thread(self):
+        pass
+
+    def exit_thread(self):
+        pass
+
+
+# Per-request receiver of stage timings (set while a request is being profiled)
+_stage_sink: ContextVar[Optional[StageSink]] = ContextVar("stage_sink", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def is_valid_trace_id(trace_id: str) -> bool:
+    """Caller-supplied IDs end up in logs and file names, so only accept plain tokens."""
+    return bool(_TRACE_ID_PATTERN.match(trace_id))
+
+
+def get_trace_id() -> str:
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: str):
+    """Bind a trace ID to the current context; returns a token for `reset_trace_id`."""
+    return _trace_id.set(trace_id)
+
+
+def reset_trace_id(token):
+    _trace_id.reset(token)
+
+
+def set_stage_sink(sink: StageSink):
+    return _stage_sink.set(sink)
+
+
+def reset_stage_sink(token):
+    _stage_sink.reset(token)
+
+
+# Every log record carries the trace ID of the request it was emitted from, including
+# records from worker threads (asyncio and LangChain copy the context into them).
+_default_record_factory = logging.getLogRecordFactory()
+
+
+def _record_factory(*args, **kwargs):
+    record = _default_record_factory(*args, **kwargs)
+    record.trace_id = _trace_id.get()
+    return record
+
+
+logging.setLogRecordFactory(_record_factory)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram with optional labels.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics registry rendered in the Prometheus text exposition format.
+    Each worker process keeps its own registry; scrape every worker.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_DURATION = metrics.histogram(
+    "rag_stage_duration_seconds",
+    "Wall time of tools, vector store operations, ingestion stages and model calls.",
+    ("component", "operation"),
+)
+STAGE_ERRORS = metrics.counter(
+    "rag_stage_errors_total",
+    "Stages that raised an exception.",
+    ("component", "operation"),
+)
+STAGE_ITEMS = metrics.counter(
+    "rag_stage_items_total",
+    "Chunks, frames, documents or results handled by a stage.",
+    ("component", "operation"),
+)
+HTTP_DURATION = metrics.histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+
+
+@contextmanager
+def timed(component: str, operation: str) -> Iterator[None]:
+    """
+    Time a block into `rag_stage_duration_seconds` and count it as an error if it raises.
+    """
+    sink = _stage_sink.get()
+    if sink is not None:
+        sink.enter_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(component=component, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, component=component, operation=operation)
+        if sink is not None:
+            sink.exit_thread()
+            sink.add_stage(component, operation, elapsed)
+
+
+def count_items(component: str, operation: str, amount: int):
+    if amount:
+        STAGE_ITEMS.inc(amount, component=component, operation=operation)
+
+
+def instrument(component: str, operation: Optional[str] = None):
+    """
+    Decorator form of `timed` for sync and async functions.
+    """
+
+    def decorator(fn):
+        name = operation or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(component, name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(component, name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that times every LLM / chat model call, including the ones the
+    ReAct agent makes internally.
+    """
+
+    def __init__(self):
+        self._starts: Dict[uuid.UUID, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, serialized, run_id, metadata):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        with self._lock:
+            self._starts[run_id] = (time.perf_counter(), str(model))
+
+    def _finish(self, run_id, failed: bool):
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        start, model = started
+        operation = f"llm:{model}"
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, component="llm", operation=operation)
+        sink = _stage_sink.get()
+        if sink is not None:
+            sink.add_stage("llm", model, elapsed)
+        if failed:
+            STAGE_ERRORS.inc(component="llm", operation=operation)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(serialized, run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(serialized, run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, failed=False)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, failed=True)
+
+
+metrics_callback = MetricsCallbackHandler()
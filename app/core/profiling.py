@@ -0,0 +1,326 @@
+"""
+Opt-in, rate-limited sampling profiler for single requests and background jobs.
+
+Profiling is off unless PROFILE_ADMIN_TOKEN is set. A profile is then requested with the
+`X-Profile: 1` header or by arming the profiler through the admin endpoint, both with the
+admin token; a request that schedules a video job hands the request on to the job.
+While a profile is active a daemon thread samples the Python call stacks of the
+request's threads every few milliseconds, and every `timed` stage and LLM call run on
+behalf of the request adds its wall time to a per-stage breakdown. The request's threads
+are the one that started the profile plus any thread currently inside one of its `timed`
+stages (e.g. `asyncio.to_thread` workers); other threads of the process are not sampled.
+For /chat the starting thread is the event loop, which other requests share, so its
+samples can include their work. Results are
+written to PROFILE_DIR as `<profile_id>.folded` (collapsed stacks for flamegraph.pl or
+speedscope) and `<profile_id>.json`. Profile IDs are generated here, never taken from the
+caller; the request's trace ID is kept in the summary.
+
+When no profile is active nothing is sampled; stages only pay for one ContextVar lookup.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import StageSink, is_valid_trace_id, new_trace_id, reset_stage_sink, set_stage_sink
+
+logger = logging.getLogger(__name__)
+
+# Whether the current request (and the background jobs it schedules) asked for a profile
+_profile_requested: ContextVar[bool] = ContextVar("profile_requested", default=False)
+
+
+# Leaf frames of threads that are blocked waiting for work; left out of the profile
+_IDLE_LEAVES = {
+    "wait (threading.py)",
+    "select (selectors.py)",
+    "_worker (concurrent/futures/thread.py)",
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f"{code.co_name} ({filename})"
+
+
+class Profile(StageSink):
+    """
+    Samples collected for one request or job, plus its per-stage wall-time breakdown.
+    """
+
+    def __init__(self, profile_id: str, kind: str, trace_id: str):
+        self.profile_id = profile_id
+        self.kind = kind
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.duration_s = 0.0
+        self.status = "running"
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stages: Dict[str, List[float]] = {}
+        self.origin_thread = threading.get_ident()
+        self.threads: Counter = Counter()
+        # Thread ident -> number of the request's stages currently running on it
+        self._active: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add_stage(self, component: str, operation: str, seconds: float):
+        name = f"{component}:{operation}"
+        with self._lock:
+            totals = self.stages.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def enter_thread(self):
+        with self._lock:
+            self._active[threading.get_ident()] += 1
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] -= 1
+            if self._active[ident] <= 0:
+                del self._active[ident]
+
+    def sample(self, frames: dict):
+        with self._lock:
+            wanted = set(self._active)
+        wanted.add(self.origin_thread)
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id in wanted:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack[0] in _IDLE_LEAVES:
+                continue
+            thread_name = names.get(thread_id, f"thread-{thread_id}")
+            stack.append(thread_name)
+            self.stacks[";".join(reversed(stack))] += 1
+            self.threads[thread_name] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {"calls": calls, "total_s": round(total, 6)}
+                for name, (calls, total) in sorted(
+                    self.stages.items(), key=lambda item: item[1][1], reverse=True
+                )
+            }
+        return {
+            "profile_id": self.profile_id,
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration_s, 6),
+            "samples": self.samples,
+            "threads": dict(self.threads.most_common()),
+            "stages": stages,
+        }
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: Profile, interval_s: float, max_seconds: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.interval_s = interval_s
+        self.max_seconds = max_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        deadline = time.perf_counter() + self.max_seconds
+        while not self.stopped.wait(self.interval_s):
+            if time.perf_counter() > deadline:
+                logger.warning(
+                    f"Profile {self.profile.profile_id} hit the {self.max_seconds}s sampling limit."
+                )
+                return
+            self.profile.sample(sys._current_frames())
+
+
+class RequestProfiler:
+    """
+    Decides which requests get profiled (header or armed, within the rate limit), runs
+    the sampler and stores finished profiles on disk.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval_ms: float = 5.0,
+        max_per_minute: int = 2,
+        max_seconds: float = 300.0,
+        max_stored: int = 50,
+        enabled: bool = True,
+    ):
+        self.directory = directory
+        self.enabled = enabled
+        self.interval_s = interval_ms / 1000
+        self.max_per_minute = max_per_minute
+        self.max_seconds = max_seconds
+        self.max_stored = max_stored
+        self._armed = 0
+        self._recent: deque = deque()
+        self._running = False
+        self._lock = threading.Lock()
+
+    def arm(self, count: int = 1) -> int:
+        """Profile the next `count` eligible requests even without the header."""
+        with self._lock:
+            self._armed = max(0, count)
+            return self._armed
+
+    @property
+    def armed(self) -> int:
+        return self._armed
+
+    @staticmethod
+    def mark_requested(requested: bool):
+        """Record whether the current request asked for a profile."""
+        _profile_requested.set(requested)
+
+    def should_profile(self) -> bool:
+        """
+        True when this request asked to be profiled (or the profiler is armed), no other
+        profile is running and the per-minute budget is not used up.
+        """
+        requested = _profile_requested.get()
+        if not self.enabled or (not requested and not self._armed):
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self._running or len(self._recent) >= self.max_per_minute:
+                return False
+            if not requested:
+                self._armed -= 1
+            self._recent.append(now)
+            self._running = True
+            return True
+
+    @contextmanager
+    def maybe_profile(self, trace_id: str, kind: str) -> Iterator[Optional[Profile]]:
+        """
+        Profile the block if `should_profile` grants it, otherwise run it untouched.
+        """
+        if not self.should_profile():
+            yield None
+            return
+        with self._profile(trace_id, kind) as profile:
+            yield profile
+
+    @contextmanager
+    def _profile(self, trace_id: str, kind: str) -> Iterator[Profile]:
+        # A fresh ID per profile, so a reused X-Request-ID cannot overwrite another profile
+        profile = Profile(new_trace_id(), kind, trace_id)
+        sampler = _Sampler(profile, self.interval_s, self.max_seconds)
+        token = set_stage_sink(profile)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield profile
+            profile.status = "done"
+        except BaseException:
+            profile.status = "error"
+            raise
+        finally:
+            sampler.stopped.set()
+            sampler.join()
+            profile.duration_s = time.perf_counter() - start
+            reset_stage_sink(token)
+            with self._lock:
+                self._running = False
+            self._save(profile)
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def _save(self, profile: Profile):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile.profile_id, "folded"), "w") as f:
+                f.write(profile.folded())
+            with open(self._path(profile.profile_id, "json"), "w") as f:
+                json.dump(profile.summary(), f, indent=2)
+            self._prune()
+        except OSError as e:
+            logger.warning(f"Could not save profile {profile.profile_id}: {e}")
+        else:
+            logger.info(
+                f"Saved profile {profile.profile_id} ({profile.samples} samples, "
+                f"{profile.duration_s:.3f}s)."
+            )
+
+    def _prune(self):
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in summaries[: max(0, len(summaries) - self.max_stored)]:
+            profile_id = entry.name[: -len(".json")]
+            for extension in ("json", "folded"):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                with open(entry.path) as f:
+                    summary = json.load(f)
+                summary.pop("stages", None)
+                profiles.append(summary)
+        return sorted(profiles, key=lambda summary: summary["started_at"], reverse=True)
+
+    def get_summary(self, profile_id: str) -> Optional[dict]:
+        if not is_valid_trace_id(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, "json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_folded(self, profile_id: str) -> Optional[str]:
+        if not is_valid_trace_id(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, "folded")) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+profiler = RequestProfiler(
+    settings.PROFILE_DIR,
+    interval_ms=settings.PROFILE_SAMPLE_INTERVAL_MS,
+    max_per_minute=settings.PROFILE_MAX_PER_MINUTE,
+    max_seconds=settings.PROFILE_MAX_SECONDS,
+    max_stored=settings.PROFILE_MAX_STORED,
+    enabled=bool(settings.PROFILE_ADMIN_TOKEN),
+)
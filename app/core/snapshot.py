@@ -0,0 +1,412 @@
+"""
+Snapshot export/import for the text and frame collections.
+
+A snapshot is a directory bundle that a new replica can bulk-load without calling any
+embedding model:
+
+    manifest.json                      format, version, per-collection counts and sha256 checksums
+    collections/<name>/embeddings.npy  float32 (count x dim), memory-mapped on import
+    collections/<name>/records.jsonl   one {"id", "document", "uri", "metadata"} line per row
+    extras/source_registry.sqlite3     source registry (if present)
+    extras/frame_index/                compact frame index files (if present)
+    extras/frames/                     the frame images the frame rows point to
+
+Frame `uri`s are stored relative to the bundle (`frames/<path under FRAMES_DIR>`) and
+rewritten to the importing node's FRAMES_DIR.
+
+    python -m app.core.snapshot export ./snapshots/2026-10-19
+    python -m app.core.snapshot import ./snapshots/2026-10-19
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.chroma_client import get_chroma_client
+from app.core.config import settings
+from app.core.embeddings import text_collection_state
+from app.core.metrics import LOG_FORMAT
+from app.core.source_registry import source_registry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOG_FORMAT,
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "dynamic-rag-snapshot"
+SNAPSHOT_VERSION = 1
+FRAME_COLLECTION_NAME = "pure_visual_frames"
+BUNDLE_FRAMES_PREFIX = "frames/"
+
+
+def snapshot_collections() -> List[str]:
+    return [text_collection_state()["active"]["name"], FRAME_COLLECTION_NAME]
+
+
+def _sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _FrameBundler:
+    """
+    Copies the frame images that exported rows point to into the bundle and hands back
+    bundle-relative uris. Missing images are counted and logged instead of failing the
+    export, since the frame rows are still usable for retrieval.
+    """
+
+    def __init__(self, bundle_dir: str):
+        self.frames_dir = os.path.abspath(settings.FRAMES_DIR)
+        self.target_dir = os.path.join(bundle_dir, "extras", "frames")
+        self.copied = 0
+        self.missing: List[str] = []
+        self._seen: Dict[str, str] = {}
+
+    def __call__(self, uri: Optional[str]) -> Optional[str]:
+        if not uri:
+            return uri
+        if uri in self._seen:
+            return self._seen[uri]
+        path = os.path.abspath(uri)
+        rel_path = os.path.relpath(path, self.frames_dir)
+        if rel_path.startswith(os.pardir):
+            digest = hashlib.sha1(uri.encode("utf-8")).hexdigest()[:12]
+            rel_path = os.path.join("external", f"{digest}_{os.path.basename(path)}")
+        rel_path = rel_path.replace(os.sep, "/")
+        if os.path.exists(path):
+            target = os.path.join(self.target_dir, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+            self.copied += 1
+        else:
+            self.missing.append(uri)
+        self._seen[uri] = BUNDLE_FRAMES_PREFIX + rel_path
+        return self._seen[uri]
+
+
+def _local_frame_uri(uri: Optional[str]) -> Optional[str]:
+    """Map a bundle-relative frame uri to this node's FRAMES_DIR."""
+    if uri and uri.startswith(BUNDLE_FRAMES_PREFIX):
+        return os.path.join(settings.FRAMES_DIR, *uri[len(BUNDLE_FRAMES_PREFIX):].split("/"))
+    return uri
+
+
+def _rewrite_frame_index_uris(directory: str, rewrite):
+    records_path = os.path.join(directory, "records.jsonl")
+    if not os.path.exists(records_path):
+        return
+    tmp_path = records_path + ".tmp"
+    with open(records_path) as source, open(tmp_path, "w") as target:
+        for line in source:
+            record = json.loads(line)
+            record["uri"] = rewrite(record["uri"])
+            target.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, records_path)
+
+
+def _export_collection(collection, directory: str, page_size: int, rewrite_uri=None) -> dict:
+    """
+    Page through a collection and write its embeddings to a .npy file and the rest to JSONL.
+    Rows added after the export started are not included.
+    """
+    os.makedirs(directory, exist_ok=True)
+    total = collection.count()
+    embeddings_path = os.path.join(directory, "embeddings.npy")
+    records_path = os.path.join(directory, "records.jsonl")
+
+    embeddings = None
+    written = 0
+    with open(records_path, "w") as records:
+        for offset in range(0, total, page_size):
+            page = collection.get(
+                include=["embeddings", "documents", "uris", "metadatas"],
+                limit=min(page_size, total - offset),
+                offset=offset,
+            )
+            if not page["ids"]:
+                break
+            page_embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    embeddings_path, mode="w+", dtype=np.float32, shape=(total, page_embeddings.shape[1])
+                )
+            embeddings[written:written + len(page_embeddings)] = page_embeddings
+            for i, item_id in enumerate(page["ids"]):
+                uri = page["uris"][i] if page["uris"] else None
+                records.write(
+                    json.dumps(
+                        {
+                            "id": item_id,
+                            "document": page["documents"][i] if page["documents"] else None,
+                            "uri": rewrite_uri(uri) if rewrite_uri else uri,
+                            "metadata": page["metadatas"][i] if page["metadatas"] else None,
+                        }
+                    )
+                    + "\n"
+                )
+            written += len(page["ids"])
+
+    dim = 0
+    if embeddings is not None:
+        dim = embeddings.shape[1]
+        embeddings.flush()
+        del embeddings
+        if written < total:
+            # Rows were deleted while exporting; shrink the array to what was written
+            trimmed = np.array(np.load(embeddings_path, mmap_mode="r")[:written])
+            np.save(embeddings_path, trimmed)
+    else:
+        np.save(embeddings_path, np.zeros((0, 0), dtype=np.float32))
+
+    return {"count": written, "dim": dim, "metadata": collection.metadata}
+
+
+def export_snapshot(output_dir: str, client=None, page_size: int = 1000) -> dict:
+    """
+    Export the text and frame collections (plus registry, frame index and frame images)
+    to a bundle. Reads go through the Chroma API, so it is safe to run against a live store.
+    """
+    if os.path.exists(output_dir) and os.listdir(output_dir):
+        raise FileExistsError(f"Snapshot directory {output_dir} is not empty")
+    os.makedirs(output_dir, exist_ok=True)
+    client = client or get_chroma_client()
+    existing = {collection.name for collection in client.list_collections()}
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "collections": {},
+        "files": {},
+    }
+    frames = _FrameBundler(output_dir)
+    for name in snapshot_collections():
+        if name not in existing:
+            continue
+        logger.info(f"Exporting collection '{name}'...")
+        collection = client.get_collection(name, embedding_function=None)
+        manifest["collections"][name] = _export_collection(
+            collection,
+            os.path.join(output_dir, "collections", name),
+            page_size,
+            rewrite_uri=frames if name == FRAME_COLLECTION_NAME else None,
+        )
+
+    extras_dir = os.path.join(output_dir, "extras")
+    if os.path.exists(settings.SOURCE_REGISTRY_PATH):
+        logger.info("Exporting source registry...")
+        os.makedirs(extras_dir, exist_ok=True)
+        source = sqlite3.connect(settings.SOURCE_REGISTRY_PATH)
+        target = sqlite3.connect(os.path.join(extras_dir, "source_registry.sqlite3"))
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    if os.path.isdir(settings.FRAME_INDEX_DIR):
+        logger.info("Exporting compact frame index...")
+        shutil.copytree(settings.FRAME_INDEX_DIR, os.path.join(extras_dir, "frame_index"))
+        _rewrite_frame_index_uris(os.path.join(extras_dir, "frame_index"), frames)
+
+    manifest["frames"] = {"copied": frames.copied, "missing": len(frames.missing)}
+    if frames.missing:
+        logger.warning(
+            f"{len(frames.missing)} frame image(s) referenced by the store were not found and are "
+            f"not in the snapshot (first: {frames.missing[0]}); those frames cannot be shown to the VLM."
+        )
+
+    for root, _, names in os.walk(output_dir):
+        for file_name in names:
+            path = os.path.join(root, file_name)
+            rel_path = os.path.relpath(path, output_dir).replace(os.sep, "/")
+            manifest["files"][rel_path] = {"sha256": _sha256(path), "bytes": os.path.getsize(path)}
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Snapshot written to {output_dir}")
+    return manifest
+
+
+def read_manifest(bundle_dir: str) -> dict:
+    """
+    Load the manifest and check the bundle format and version.
+    """
+    with open(os.path.join(bundle_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{bundle_dir} is not a {SNAPSHOT_FORMAT} bundle")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot version {manifest.get('version')} (expected {SNAPSHOT_VERSION})"
+        )
+    return manifest
+
+
+def verify_snapshot(bundle_dir: str) -> dict:
+    """
+    Check the manifest and every file checksum. Returns the manifest.
+    """
+    manifest = read_manifest(bundle_dir)
+    for rel_path, info in manifest["files"].items():
+        path = os.path.join(bundle_dir, rel_path)
+        if not os.path.exists(path):
+            raise ValueError(f"Snapshot file missing: {rel_path}")
+        if _sha256(path) != info["sha256"]:
+            raise ValueError(f"Checksum mismatch for snapshot file: {rel_path}")
+    return manifest
+
+
+def _frame_index_has_frames(directory: str) -> bool:
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)["count"] > 0
+    except FileNotFoundError:
+        return False
+
+
+def _import_collection(client, name: str, info: dict, directory: str, batch_size: int) -> int:
+    collection = client.get_or_create_collection(
+        name, metadata=info.get("metadata"), embedding_function=None
+    )
+    if not info["count"]:
+        return 0
+    embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+
+    def column(batch: List[dict], key: str):
+        values = [record[key] for record in batch]
+        return values if any(value is not None for value in values) else None
+
+    def flush(batch: List[dict], start: int):
+        uris = column(batch, "uri")
+        collection.upsert(
+            ids=[record["id"] for record in batch],
+            embeddings=np.asarray(embeddings[start:start + len(batch)]),
+            documents=column(batch, "document"),
+            uris=[_local_frame_uri(uri) for uri in uris] if uris else None,
+            metadatas=column(batch, "metadata"),
+        )
+
+    loaded = 0
+    batch: List[dict] = []
+    with open(os.path.join(directory, "records.jsonl")) as records:
+        for line in records:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                flush(batch, loaded)
+                loaded += len(batch)
+                batch = []
+    if batch:
+        flush(batch, loaded)
+        loaded += len(batch)
+    return loaded
+
+
+def import_snapshot(
+    bundle_dir: str, client=None, batch_size: int = 5000, force: bool = False, verify: bool = True
+) -> Dict[str, int]:
+    """
+    Bulk-load a snapshot bundle into the configured store using the stored embeddings.
+    No embedding model is called. An existing source registry is overwritten through
+    SQLite's backup API, which is safe while other connections have it open.
+    """
+    manifest = verify_snapshot(bundle_dir) if verify else read_manifest(bundle_dir)
+    extras_dir = os.path.join(bundle_dir, "extras")
+    registry_snapshot = os.path.join(extras_dir, "source_registry.sqlite3")
+    frame_index_snapshot = os.path.join(extras_dir, "frame_index")
+    # The registry file and frame index directory are created empty as soon as the app
+    # modules load, so only refuse when they already hold something
+    if not force:
+        if os.path.exists(registry_snapshot) and not source_registry.is_empty():
+            raise FileExistsError(
+                f"{settings.SOURCE_REGISTRY_PATH} already holds sources; pass force=True to overwrite it"
+            )
+        if os.path.isdir(frame_index_snapshot) and _frame_index_has_frames(settings.FRAME_INDEX_DIR):
+            raise FileExistsError(
+                f"{settings.FRAME_INDEX_DIR} already holds frames; pass force=True to overwrite it"
+            )
+
+    client = client or get_chroma_client()
+    stats = {}
+    for name, info in manifest["collections"].items():
+        logger.info(f"Importing {info['count']} rows into collection '{name}'...")
+        stats[name] = _import_collection(
+            client, name, info, os.path.join(bundle_dir, "collections", name), batch_size
+        )
+
+    if os.path.exists(registry_snapshot):
+        os.makedirs(os.path.dirname(settings.SOURCE_REGISTRY_PATH) or ".", exist_ok=True)
+        # Copying the file over a live WAL database could mix its pages with the -wal file;
+        # the backup API replaces the content page by page under SQLite's own locking
+        source = sqlite3.connect(registry_snapshot)
+        target = sqlite3.connect(settings.SOURCE_REGISTRY_PATH, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    if os.path.isdir(frame_index_snapshot):
+        shutil.rmtree(settings.FRAME_INDEX_DIR, ignore_errors=True)
+        shutil.copytree(frame_index_snapshot, settings.FRAME_INDEX_DIR)
+        _rewrite_frame_index_uris(settings.FRAME_INDEX_DIR, _local_frame_uri)
+    frames_snapshot = os.path.join(extras_dir, "frames")
+    if os.path.isdir(frames_snapshot):
+        shutil.copytree(frames_snapshot, settings.FRAMES_DIR, dirs_exist_ok=True)
+        stats["frame_images"] = sum(len(names) for _, _, names in os.walk(frames_snapshot))
+    logger.info(f"Snapshot {bundle_dir} imported: {stats}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export or import vector store snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a snapshot bundle.")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--page-size", type=int, default=1000)
+
+    import_parser = subparsers.add_parser("import", help="Bulk-load a snapshot bundle.")
+    import_parser.add_argument("bundle_dir")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.add_argument(
+        "--force", action="store_true", help="Overwrite an existing source registry / frame index."
+    )
+    import_parser.add_argument(
+        "--skip-verify", action="store_true", help="Do not verify file checksums before loading."
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        manifest = export_snapshot(args.output_dir, page_size=args.page_size)
+        print(
+            json.dumps(
+                {
+                    **{name: info["count"] for name, info in manifest["collections"].items()},
+                    "frame_images": manifest["frames"]["copied"],
+                    "missing_frame_images": manifest["frames"]["missing"],
+                }
+            )
+        )
+    else:
+        stats = import_snapshot(
+            args.bundle_dir,
+            batch_size=args.batch_size,
+            force=args.force,
+            verify=not args.skip_verify,
+        )
+        print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
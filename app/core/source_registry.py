@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+
+class SourceRegistry:
+    """
+    Keeps track of which vector store entries belong to each indexed source.
+    Every PDF, webpage and video is registered under a stable source ID together with
+    the IDs and content hashes of its chunks or frames, so a source can be deleted or
+    re-indexed without touching the rest of the collection.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    source_id TEXT PRIMARY KEY,
+                    source_type TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS items (
+                    source_id TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (source_id, item_id)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_source_id(source_type: str, name: str) -> str:
+        """
+        Derive a stable source ID from the source type and its filename or URL.
+        """
+        return hashlib.sha256(f"{source_type}:{name}".encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def hash_content(*parts) -> str:
+        """
+        Hash chunk or frame content together with its metadata.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                digest.update(part)
+            elif isinstance(part, str):
+                digest.update(part.encode("utf-8"))
+            else:
+                digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def is_empty(self) -> bool:
+        """True when no source and no shared setting has been recorded yet."""
+        with self._connect() as conn:
+            return not conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM sources) OR EXISTS (SELECT 1 FROM meta)"
+            ).fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[dict]:
+        """
+        Read a JSON value shared by every process using this registry.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value: Optional[dict]):
+        with self._lock, self._connect() as conn:
+            if value is None:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (key, json.dumps(value)),
+                )
+
+    def setdefault_meta(self, key: str, value: dict) -> dict:
+        """
+        Store `value` unless the key is already set, and return whichever value won.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO NOTHING",
+                (key, json.dumps(value)),
+            )
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0])
+
+    def get_source(self, source_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT source_id, source_type, name, updated_at FROM sources WHERE source_id = ?",
+                (source_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            count = conn.execute(
+                "SELECT COUNT(*) FROM items WHERE source_id = ?", (source_id,)
+            ).fetchone()[0]
+        return {
+            "source_id": row[0],
+            "source_type": row[1],
+            "name": row[2],
+            "updated_at": row[3],
+            "item_count": count,
+        }
+
+    def list_sources(self) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.source_id, s.source_type, s.name, s.updated_at, COUNT(i.item_id)
+                FROM sources s LEFT JOIN items i ON s.source_id = i.source_id
+                GROUP BY s.source_id ORDER BY s.updated_at DESC
+                """
+            ).fetchall()
+        return [
+            {
+                "source_id": row[0],
+                "source_type": row[1],
+                "name": row[2],
+                "updated_at": row[3],
+                "item_count": row[4],
+            }
+            for row in rows
+        ]
+
+    def get_items(self, source_id: str) -> Dict[str, str]:
+        """
+        Return a mapping of item ID -> content hash for a source.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT item_id, hash FROM items WHERE source_id = ?", (source_id,)
+            ).fetchall()
+        return {item_id: item_hash for item_id, item_hash in rows}
+
+    @staticmethod
+    def _upsert_source(conn, source_id: str, source_type: str, name: str):
+        conn.execute(
+            """
+            INSERT INTO sources (source_id, source_type, name, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(source_id) DO UPDATE SET
+                source_type = excluded.source_type,
+                name = excluded.name,
+                updated_at = excluded.updated_at
+            """,
+            (source_id, source_type, name, time.time()),
+        )
+
+    def register_source(self, source_id: str, source_type: str, name: str):
+        """
+        Register a source (or refresh its name and timestamp) without touching its items.
+        """
+        with self._lock, self._connect() as conn:
+            self._upsert_source(conn, source_id, source_type, name)
+
+    def replace_items(
+        self, source_id: str, source_type: str, name: str, kind: str, items: Dict[str, str]
+    ):
+        """
+        Register a source and replace its item set with `items` (item ID -> content hash).
+        """
+        with self._lock, self._connect() as conn:
+            self._upsert_source(conn, source_id, source_type, name)
+            conn.execute("DELETE FROM items WHERE source_id = ?", (source_id,))
+            conn.executemany(
+                "INSERT INTO items (source_id, item_id, kind, hash) VALUES (?, ?, ?, ?)",
+                [(source_id, item_id, kind, item_hash) for item_id, item_hash in items.items()],
+            )
+
+    def add_items(self, source_id: str, kind: str, items: Dict[str, str]):
+        """
+        Add items to an already registered source, keeping the ones it has.
+        """
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO items (source_id, item_id, kind, hash) VALUES (?, ?, ?, ?)",
+                [(source_id, item_id, kind, item_hash) for item_id, item_hash in items.items()],
+            )
+
+    def remove_items(self, source_id: str, item_ids: List[str]):
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM items WHERE source_id = ? AND item_id = ?",
+                [(source_id, item_id) for item_id in item_ids],
+            )
+
+    def delete_source(self, source_id: str) -> List[str]:
+        """
+        Remove a source from the registry and return the item IDs that belonged to it.
+        """
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT item_id FROM items WHERE source_id = ?", (source_id,)
+            ).fetchall()
+            conn.execute("DELETE FROM items WHERE source_id = ?", (source_id,))
+            conn.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+        return [row[0] for row in rows]
+
+
+# Global instance shared by the text and video stores
+source_registry = SourceRegistry(settings.SOURCE_REGISTRY_PATH)
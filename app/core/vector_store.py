@@ -1,19 +1,28 @@
-from typing import List,Optional
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, List, Optional
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-import chromadb
 from chromadb.utils.embedding_functions import OpenCLIPEmbeddingFunction
 from chromadb.utils.data_loaders import ImageLoader
 import torch
 import logging
 
 
+from app.core.chroma_client import call_with_retries, get_chroma_client
 from app.core.config import settings
+from app.core.dedup import DedupBatch, near_duplicate_index
+from app.core.embeddings import TEXT_STATE_REFRESH_S, get_text_embeddings, text_collection_state
+from app.core.frame_index import QuantizedFrameIndex
+from app.core.metrics import LOG_FORMAT, count_items, timed
+from app.core.source_registry import source_registry
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 logger = logging.getLogger(__name__)
@@ -24,15 +33,26 @@ class VectorStoreManager:
     """
 
     def __init__(self,is_api=True,is_video_processing=False):
+        self.is_video_processing = is_video_processing
+        self.frame_index = None
         if is_api and not is_video_processing:
-        # Initialize embeddings with the API key from settings
-            self.embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-            # Initialize ChromaDB instance
-            self.vector_store = Chroma(
-                collection_name=settings.COLLECTION_NAME,
-                embedding_function=self.embeddings,
-                persist_directory=settings.CHROMA_DB_DIR,
-            )
+            # Text collection and embedding backend come from the source registry, so a
+            # background re-embedding migration can switch them without a restart
+            self._text_stores: Dict[str, Chroma] = {}
+            self._text_state = None
+            self._text_state_checked_at = 0.0
+            self.mirror_store = None
+            self._refresh_text_state(force=True)
+            active = self._text_state["active"]
+            if active["backend"] != settings.TEXT_EMBEDDING_BACKEND or (
+                settings.TEXT_EMBEDDING_MODEL and active.get("model") != settings.TEXT_EMBEDDING_MODEL
+            ):
+                logger.warning(
+                    f"Collection '{active['name']}' is embedded with the {active['backend']} backend "
+                    f"(model {active.get('model') or 'default'}), not TEXT_EMBEDDING_BACKEND="
+                    f"{settings.TEXT_EMBEDDING_BACKEND}; it keeps being queried with its own backend. "
+                    f"Run `python -m app.core.embedding_migration` or POST /embeddings/migrate to switch."
+                )
         else:
             logger.info(f"PyTorch version: {torch.__version__}")
             logger.info(f"CUDA available: {torch.cuda.is_available()}")
@@ -51,18 +71,166 @@ class VectorStoreManager:
             # We need an ImageLoader so Chroma knows how to read the physical files
             logger.info("Initializing Image Loader...")
             image_loader = ImageLoader()
+            self.image_loader = image_loader
 
-            # Create the database connection
-            logger.info("Connecting to ChromaDB persistent client...")
-            client = chromadb.PersistentClient(path=settings.CHROMA_DB_DIR)
+            # Create (or reuse) the database connection for the configured backend
+            client = get_chroma_client()
 
             logger.info("Getting or creating Chroma collection 'pure_visual_frames'...")
-            self.vector_store = client.get_or_create_collection(
+            self.vector_store = call_with_retries(
+                client.get_or_create_collection,
                 name="pure_visual_frames",
                 embedding_function=self.embeddings,
                 data_loader=image_loader
             )
-        
+
+            if settings.FRAME_INDEX_QUANTIZATION != "none":
+                logger.info(
+                    f"Opening {settings.FRAME_INDEX_QUANTIZATION} compact frame index at {settings.FRAME_INDEX_DIR}..."
+                )
+                self.frame_index = QuantizedFrameIndex(
+                    settings.FRAME_INDEX_DIR,
+                    quantization=settings.FRAME_INDEX_QUANTIZATION,
+                    rerank_factor=settings.FRAME_INDEX_RERANK_FACTOR,
+                )
+                if not self.frame_index.imported:
+                    self._import_frames_from_collection()
+            elif os.path.exists(os.path.join(settings.FRAME_INDEX_DIR, "meta.json")):
+                self._export_frames_to_collection(settings.FRAME_INDEX_DIR)
+
+    def _text_store(self, spec: dict) -> Chroma:
+        store = self._text_stores.get(spec["name"])
+        if store is None:
+            store = self._text_stores[spec["name"]] = Chroma(
+                collection_name=spec["name"],
+                embedding_function=get_text_embeddings(spec["backend"], spec.get("model")),
+                client=get_chroma_client(),
+            )
+        return store
+
+    def _refresh_text_state(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._text_state_checked_at < TEXT_STATE_REFRESH_S:
+            return
+        self._text_state_checked_at = now
+        state = text_collection_state()
+        if state == self._text_state:
+            return
+        if self._text_state is not None and state["active"] != self._text_state["active"]:
+            logger.info(f"Switching the text store to collection '{state['active']['name']}'.")
+        self.vector_store = self._text_store(state["active"])
+        self.embeddings = self.vector_store.embeddings
+        self.mirror_store = self._text_store(state["mirror"]) if state["mirror"] else None
+        self._text_state = state
+
+    def _text_write_stores(self) -> List[Chroma]:
+        """
+        The active text store, plus the migration target while a migration is copying.
+        Re-read on every write so no worker misses the start of a migration.
+        """
+        self._refresh_text_state(force=True)
+        return [self.vector_store] + ([self.mirror_store] if self.mirror_store is not None else [])
+
+    def _import_frames_from_collection(self, page_size: int = 1000):
+        """
+        One-off move of the frames already stored in Chroma into the compact index. The
+        Chroma rows are dropped afterwards, since deletes only reach the index from now
+        on. Frame IDs are kept, so the source registry stays valid. An interrupted move is
+        simply repeated: adding an ID the index already holds replaces it.
+        """
+        total = call_with_retries(self.vector_store.count)
+        if total:
+            logger.info(f"Moving {total} existing frames into the compact frame index...")
+            for offset in range(0, total, page_size):
+                page = call_with_retries(
+                    self.vector_store.get,
+                    include=["embeddings", "uris", "metadatas"], limit=page_size, offset=offset
+                )
+                self.frame_index.add(page["ids"], page["embeddings"], page["uris"], page["metadatas"])
+            while True:
+                page = call_with_retries(self.vector_store.get, include=[], limit=page_size)
+                if not page["ids"]:
+                    break
+                call_with_retries(self.vector_store.delete, ids=page["ids"])
+        self.frame_index.mark_imported()
+
+    def _export_frames_to_collection(self, directory: str):
+        """
+        Reverse of `_import_frames_from_collection`, for when FRAME_INDEX_QUANTIZATION is
+        switched back to none: the index's frames are written back to Chroma under the
+        same IDs and the index is removed. Vectors come from the index's float16 copies.
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            quantization = json.load(f)["quantization"]
+        frame_index = QuantizedFrameIndex(directory, quantization=quantization)
+        logger.info(f"Moving {len(frame_index)} frames from the compact frame index back into Chroma...")
+        for ids, vectors, uris, metadatas in frame_index.iter_frames():
+            call_with_retries(
+                self.vector_store.upsert, ids=ids, embeddings=vectors, uris=uris, metadatas=metadatas
+            )
+        shutil.rmtree(directory)
+
+    def _add_frames(
+        self,
+        ids: List[str],
+        paths: List[str],
+        metadatas: List[dict],
+        uris: Optional[List[str]] = None,
+        batch_size: int = 64,
+    ):
+        """
+        Embed the images at `paths` and store them under `uris` (defaults to `paths`; differs
+        when frames are read from a staging folder before being moved into place).
+        """
+        uris = uris or paths
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            batch_paths = paths[start:start + batch_size]
+            batch_uris = uris[start:start + batch_size]
+            batch_metadatas = metadatas[start:start + batch_size]
+            # Embed explicitly (instead of letting Chroma load the uris) so the vision model
+            # and the write are timed as separate stages
+            with timed("ingest", "embed"):
+                embeddings = self.embeddings(self.image_loader(batch_paths))
+            with timed("ingest", "write"):
+                if self.frame_index is None:
+                    call_with_retries(
+                        self.vector_store.add,
+                        ids=batch_ids,
+                        embeddings=embeddings,
+                        uris=batch_uris,
+                        metadatas=batch_metadatas,
+                    )
+                else:
+                    self.frame_index.add(batch_ids, embeddings, batch_uris, batch_metadatas)
+            count_items("ingest", "embed", len(batch_ids))
+
+    def _add_chunks(self, ids: List[str], documents: List[Document]):
+        texts = [doc.page_content for doc in documents]
+        for store in self._text_write_stores():
+            with timed("ingest", "embed"):
+                embeddings = store.embeddings.embed_documents(texts)
+            with timed("ingest", "write"):
+                call_with_retries(
+                    store._collection.upsert,
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=texts,
+                    metadatas=[doc.metadata for doc in documents],
+                )
+            count_items("ingest", "embed", len(ids))
+
+    def _delete_items(self, ids: List[str]):
+        with timed("vector_store", "delete"):
+            if self.frame_index is not None:
+                self.frame_index.delete(ids)
+            elif self.is_video_processing:
+                call_with_retries(self.vector_store.delete, ids=ids)
+            else:
+                for store in self._text_write_stores():
+                    call_with_retries(store.delete, ids=ids)
+        count_items("vector_store", "delete", len(ids))
+
 
     def add_documents(self, documents: Optional[List[Document]],extracted_metadata:Optional[dict]=None,is_video_processing=False):
         """
@@ -77,17 +245,226 @@ class VectorStoreManager:
 
             # Notice we use 'uris' instead of 'documents'. 
             logger.info(f"Adding {len(ids)} frames to the Chroma collection...")
-            # Chroma will open the images, pass them through the local Vision model, and save the vectors!
-            self.vector_store.add(
-                ids=ids,
-                uris=paths,
-                metadatas=metadatas
-            )
+            self._add_frames(ids, paths, metadatas)
             
         else:
             if not documents:
                 return
-            self.vector_store.add_documents(documents)
+            with timed("vector_store", "add_documents"):
+                self._add_chunks([str(uuid.uuid4()) for _ in documents], documents)
+            count_items("vector_store", "add_documents", len(documents))
+
+    def index_source(
+        self,
+        source_id: str,
+        source_type: str,
+        name: str,
+        documents: Optional[List[Document]] = None,
+        extracted_metadata: Optional[List[dict]] = None,
+    ) -> Dict[str, int]:
+        """
+        Incrementally (re-)index a source.
+        New chunk/frame hashes are diffed against the ones recorded in the source registry,
+        so only the entries that changed are embedded, inserted or deleted.
+        """
+        items = extracted_metadata if self.is_video_processing else documents
+        return self.index_sources([(source_id, source_type, name, items or [])])[source_id]
+
+    def index_sources(self, sources: List[tuple]) -> Dict[str, Dict[str, int]]:
+        """
+        Incrementally (re-)index several sources with batched vector store writes.
+        `sources` holds (source_id, source_type, name, items) tuples where items are
+        Documents for the text store or frame metadata dicts for the video store.
+        """
+        with timed("vector_store", "index_sources"):
+            return self._index_sources(sources)
+
+    def _index_sources(self, sources: List[tuple]) -> Dict[str, Dict[str, int]]:
+        stats = {}
+        new_items_by_source = {}
+        to_delete: List[str] = []
+        to_add: Dict[str, object] = {}
+        owners: Dict[str, str] = {}  # item ID -> source ID of the entries to add
+        dedup_batch = DedupBatch() if self._dedup_enabled() else None
+        for source_id, _, _, items in sources:
+            duplicates = 0
+            if self.is_video_processing:
+                new_items = self._hash_frames(source_id, items)
+            else:
+                new_items = self._hash_documents(source_id, items)
+                if dedup_batch is not None:
+                    # Near duplicates are dropped here, before anything is embedded
+                    with timed("ingest", "dedup"):
+                        kept = near_duplicate_index.deduplicate(source_id, new_items, dedup_batch)
+                    duplicates = len(new_items) - len(kept)
+                    count_items("ingest", "dedup", duplicates)
+                    new_items = kept
+            old_hashes = source_registry.get_items(source_id)
+            stale = [item_id for item_id in old_hashes if item_id not in new_items]
+            fresh = {item_id: item for item_id, item in new_items.items() if item_id not in old_hashes}
+            to_delete.extend(stale)
+            to_add.update(fresh)
+            owners.update((item_id, source_id) for item_id in fresh)
+            new_items_by_source[source_id] = new_items
+            stats[source_id] = {
+                "added": len(fresh),
+                "deleted": len(stale),
+                "unchanged": len(new_items) - len(fresh),
+                "duplicates": duplicates,
+            }
+
+        # New entries go in first and are registered batch by batch, so a failure part-way
+        # leaves the old entries searchable and every written entry deletable. Stale
+        # entries are only removed once all additions landed.
+        kind = "frame" if self.is_video_processing else "chunk"
+        new_sources = [
+            source_id for source_id, _, _, _ in sources if source_registry.get_source(source_id) is None
+        ]
+        for source_id, source_type, name, _ in sources:
+            source_registry.register_source(source_id, source_type, name)
+        ids = list(to_add.keys())
+        batch_size = settings.VECTOR_WRITE_BATCH_SIZE
+        if ids:
+            logger.info(f"Adding {len(ids)} new entries for {len(sources)} source(s)...")
+        added: List[str] = []
+        try:
+            for start in range(0, len(ids), batch_size):
+                batch_ids = ids[start:start + batch_size]
+                if self.is_video_processing:
+                    self._add_frames(
+                        batch_ids,
+                        [to_add[item_id]["path"] for item_id in batch_ids],
+                        [
+                            {
+                                "timestamp": to_add[item_id]["timestamp"],
+                                "source_id": owners[item_id],
+                            }
+                            for item_id in batch_ids
+                        ],
+                        [to_add[item_id].get("uri", to_add[item_id]["path"]) for item_id in batch_ids],
+                    )
+                else:
+                    self._add_chunks(batch_ids, [to_add[item_id] for item_id in batch_ids])
+                added.extend(batch_ids)
+                for source_id, source_ids in self._group_by_source(batch_ids, owners).items():
+                    source_registry.add_items(
+                        source_id, kind, {item_id: item_id.split(":", 1)[1] for item_id in source_ids}
+                    )
+        except Exception:
+            self._roll_back_additions(added, owners, new_sources)
+            raise
+
+        if to_delete:
+            logger.info(f"Deleting {len(to_delete)} stale entries for {len(sources)} source(s)...")
+            self._delete_items(to_delete)
+
+        for source_id, source_type, name, _ in sources:
+            source_registry.replace_items(
+                source_id,
+                source_type,
+                name,
+                kind,
+                {item_id: item_id.split(":", 1)[1] for item_id in new_items_by_source[source_id]},
+            )
+        if dedup_batch is not None:
+            self._restore_duplicates(near_duplicate_index.commit(dedup_batch))
+        return stats
+
+    @staticmethod
+    def _group_by_source(item_ids: List[str], owners: Dict[str, str]) -> Dict[str, List[str]]:
+        grouped: Dict[str, List[str]] = {}
+        for item_id in item_ids:
+            grouped.setdefault(owners[item_id], []).append(item_id)
+        return grouped
+
+    def _roll_back_additions(self, item_ids: List[str], owners: Dict[str, str], new_sources: List[str]):
+        """
+        Remove the entries a failed indexing run already wrote, and the sources it
+        registered. Frames point at a folder that is never committed after a failure, so
+        they must not stay behind. If the rollback fails too, the entries stay registered
+        and DELETE /sources removes them.
+        """
+        if item_ids:
+            try:
+                self._delete_items(item_ids)
+            except Exception as e:
+                logger.error(f"Could not roll back {len(item_ids)} entries of a failed indexing run: {e}")
+                return
+            for source_id, source_ids in self._group_by_source(item_ids, owners).items():
+                source_registry.remove_items(source_id, source_ids)
+        for source_id in new_sources:
+            source_registry.delete_source(source_id)
+
+    def _dedup_enabled(self) -> bool:
+        return settings.DEDUP_ENABLED and not self.is_video_processing
+
+    def _restore_duplicates(self, orphans: List[tuple]):
+        """
+        Index chunks that were dropped as near duplicates of a chunk that has since been
+        deleted, under the sources they came from.
+        """
+        if not orphans:
+            return
+        by_source: Dict[str, Dict[str, Document]] = {}
+        for item_id, source_id, doc in orphans:
+            by_source.setdefault(source_id, {})[item_id] = doc
+        dedup_batch = DedupBatch()
+        restored = 0
+        for source_id, docs in by_source.items():
+            if source_registry.get_source(source_id) is None:
+                continue
+            kept = near_duplicate_index.deduplicate(source_id, docs, dedup_batch, replace=False)
+            if kept:
+                self._add_chunks(list(kept), list(kept.values()))
+                source_registry.add_items(
+                    source_id, "chunk", {item_id: item_id.split(":", 1)[1] for item_id in kept}
+                )
+                restored += len(kept)
+        near_duplicate_index.commit(dedup_batch)
+        logger.info(f"Restored {restored} chunk(s) whose near-duplicate original was removed.")
+
+    def delete_source(self, source_id: str) -> int:
+        """
+        Remove every chunk or frame belonging to a source and unregister it.
+        """
+        with timed("vector_store", "delete_source"):
+            item_ids = source_registry.delete_source(source_id)
+            if item_ids:
+                self._delete_items(item_ids)
+            if self._dedup_enabled():
+                self._restore_duplicates(near_duplicate_index.remove_source(source_id))
+        return len(item_ids)
+
+    @staticmethod
+    def _hash_documents(source_id: str, documents: List[Document]) -> Dict[str, Document]:
+        """
+        Assign content-addressed IDs to chunks. Identical chunks within the same source
+        get an occurrence suffix so their IDs stay unique.
+        """
+        items = {}
+        seen: Dict[str, int] = {}
+        for doc in documents:
+            doc.metadata["source_id"] = source_id
+            content_hash = source_registry.hash_content(doc.page_content, doc.metadata)[:32]
+            occurrence = seen.get(content_hash, 0)
+            seen[content_hash] = occurrence + 1
+            item_id = f"{source_id}:{content_hash}"
+            if occurrence:
+                item_id = f"{item_id}:{occurrence}"
+            items[item_id] = doc
+        return items
+
+    @staticmethod
+    def _hash_frames(source_id: str, extracted_metadata: List[dict]) -> Dict[str, dict]:
+        """
+        Assign content-addressed IDs to frames based on image bytes and timestamp.
+        """
+        items = {}
+        for item in extracted_metadata:
+            with open(item["path"], "rb") as f:
+                content_hash = source_registry.hash_content(f.read(), item["timestamp"])[:32]
+            items[f"{source_id}:{content_hash}"] = item
+        return items
 
     def similarity_search(self, query: str, k: int = 2) -> List[Document]:
         """
@@ -95,18 +472,84 @@ class VectorStoreManager:
         """
         if isinstance(self.vector_store,Chroma):
             # LangChain wrapper — used for text/PDF RAG
-            result = self.vector_store.similarity_search(query, k=k)
+            self._refresh_text_state()
+            with timed("vector_store", "embed_query"):
+                query_embedding = self.embeddings.embed_query(query)
+            with timed("vector_store", "search"):
+                result = call_with_retries(self.vector_store.similarity_search_by_vector, query_embedding, k=k)
+            hits = len(result)
 
         else:
-            # Raw ChromaDB collection — used for video frames
-            result = self.vector_store.query(
-                query_texts=[query],
-                n_results=k,
-                include=["uris", "metadatas"]
-            )
-        logger.info(result)
+            # Video frames — CLIP text embedding, then the compact index or the raw collection
+            with timed("vector_store", "embed_query"):
+                query_embedding = self.embeddings([query])[0]
+            with timed("vector_store", "search"):
+                if self.frame_index is not None:
+                    # Compact quantized index — approximate scan plus exact rerank
+                    result = self.frame_index.search(query_embedding, k=k)
+                else:
+                    result = call_with_retries(
+                        self.vector_store.query,
+                        query_embeddings=[query_embedding],
+                        n_results=k,
+                        include=["uris", "metadatas"]
+                    )
+            hits = len(result["ids"][0]) if result["ids"] else 0
+        count_items("vector_store", "search", hits)
+        logger.info(f"Similarity search returned {hits} result(s) (k={k}).")
         return result
 
+    def similarity_search_batch(self, queries: List[str], k: int = 2) -> List:
+        """
+        `similarity_search` for many queries at once: one batched embedding call and one
+        multi-query Chroma `query`. Returns one result per query, shaped as
+        `similarity_search` would return it.
+        """
+        if not queries:
+            return []
+        if isinstance(self.vector_store, Chroma):
+            self._refresh_text_state()
+            with timed("vector_store", "embed_query"):
+                query_embeddings = self.embeddings.embed_documents(queries)
+            with timed("vector_store", "search"):
+                result = call_with_retries(
+                    self.vector_store._collection.query,
+                    query_embeddings=query_embeddings,
+                    n_results=k,
+                    include=["documents", "metadatas"],
+                )
+            results = [
+                [
+                    Document(page_content=document, metadata=metadata or {})
+                    for document, metadata in zip(documents, metadatas)
+                ]
+                for documents, metadatas in zip(result["documents"], result["metadatas"])
+            ]
+            hits = sum(len(docs) for docs in results)
+
+        else:
+            with timed("vector_store", "embed_query"):
+                query_embeddings = self.embeddings(queries)
+            with timed("vector_store", "search"):
+                if self.frame_index is not None:
+                    # The quantized scan is per query; the batch still shares one embedding call
+                    results = [self.frame_index.search(embedding, k=k) for embedding in query_embeddings]
+                else:
+                    result = call_with_retries(
+                        self.vector_store.query,
+                        query_embeddings=list(query_embeddings),
+                        n_results=k,
+                        include=["uris", "metadatas"]
+                    )
+                    results = [
+                        {"ids": [ids], "uris": [uris], "metadatas": [metadatas]}
+                        for ids, uris, metadatas in zip(result["ids"], result["uris"], result["metadatas"])
+                    ]
+            hits = sum(len(result["ids"][0]) for result in results)
+        count_items("vector_store", "search", hits)
+        logger.info(f"Batched similarity search for {len(queries)} queries returned {hits} result(s) (k={k}).")
+        return results
+
     def get_retriever(self, search_kwargs: dict = None):
         """
         Return a retriever interface for LangChain tools/chains.
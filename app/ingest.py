@@ -0,0 +1,310 @@
+"""
+Bulk offline ingestion of PDFs, videos and URLs.
+
+Walks a directory (or reads a manifest), extracts files in parallel and writes to the
+vector store in batches from the main process. PDFs are extracted in worker processes
+(PyMuPDF is not thread-safe and holds the GIL); videos and URLs in worker threads. Progress is recorded per file in a checkpoint
+file, so an interrupted run picks up where it stopped.
+
+    python -m app.ingest ./corpus --workers 8 --checkpoint ingest_checkpoint.jsonl
+    python -m app.ingest manifest.txt
+
+A manifest is a text file with one path or URL per line, or a .jsonl file with
+{"path": ..., "name": ...} objects. Source names default to the path relative to the
+ingested directory (or as written in the manifest) and determine the source ID.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from app.core.metrics import LOG_FORMAT
+from app.core.source_registry import SourceRegistry
+from app.services.pdf_extraction import extract_pdf_file
+from app.services.search_service import search_service
+
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOG_FORMAT,
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# The vector stores (and the models behind them) are imported where they are used: the
+# spawned PDF workers re-import this module and must not load them
+
+PDF_EXTENSIONS = {".pdf"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+
+
+def _source_type(path: str) -> Optional[str]:
+    if path.startswith(("http://", "https://")):
+        return "web"
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return "pdf"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    return None
+
+
+def discover_inputs(target: str) -> List[dict]:
+    """
+    Expand a directory or manifest into a list of {"path", "name", "type"} entries.
+    """
+    entries = []
+    if os.path.isdir(target):
+        for root, _, names in os.walk(target):
+            for file_name in sorted(names):
+                path = os.path.join(root, file_name)
+                entries.append(
+                    {"path": path, "name": os.path.relpath(path, target).replace(os.sep, "/")}
+                )
+    else:
+        with open(target) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if target.endswith(".jsonl"):
+                    record = json.loads(line)
+                    entries.append({"path": record["path"], "name": record.get("name") or record["path"]})
+                else:
+                    entries.append({"path": line, "name": line})
+
+    inputs = []
+    for entry in entries:
+        source_type = _source_type(entry["path"])
+        if source_type is None:
+            continue
+        entry["type"] = source_type
+        inputs.append(entry)
+    return inputs
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished inputs. A file is skipped on resume when it is
+    recorded as done with the same size and modification time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of an interrupted run
+                    if record.get("status") == "done":
+                        self.done[record["path"]] = record["fingerprint"]
+                    else:
+                        self.done.pop(record["path"], None)
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(entry: dict) -> str:
+        if entry["type"] == "web":
+            return "url"
+        stat = os.stat(entry["path"])
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def is_done(self, entry: dict) -> bool:
+        try:
+            return self.done.get(entry["path"]) == self.fingerprint(entry)
+        except OSError:
+            return False
+
+    def record(self, entry: dict, status: str, **fields):
+        try:
+            fingerprint = self.fingerprint(entry)
+        except OSError:
+            fingerprint = None
+        with self._lock:
+            self._file.write(
+                json.dumps({"path": entry["path"], "status": status, "fingerprint": fingerprint, **fields})
+                + "\n"
+            )
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def extract(entry: dict) -> list:
+    """
+    Worker-thread step for videos and URLs: turn one input into frames or chunks without
+    touching the store. PDFs go through `extract_pdf_file` in a worker process instead.
+    """
+    if entry["type"] == "video":
+        from app.services.cleanup_temp import extract_video_frames
+
+        return extract_video_frames(entry["path"], entry["source_id"])
+    items = asyncio.run(search_service.fetch_and_parse_webpage(entry["path"]))
+    if not items:
+        raise ValueError(f"No content could be extracted from {entry['path']}")
+    return items
+
+
+class BatchWriter:
+    """
+    Buffers extracted sources and flushes them to the text or video store once a batch
+    holds `batch_size` chunks/frames. Checkpoint entries are written after each flush.
+    """
+
+    def __init__(self, checkpoint: Checkpoint, batch_size: int):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.pending = {"text": [], "video": []}
+        self.totals = {"files": 0, "chunks": 0, "frames": 0, "errors": 0}
+
+    def add(self, extracted: dict):
+        store = "video" if extracted["type"] == "video" else "text"
+        self.pending[store].append(extracted)
+        if sum(len(item["items"]) for item in self.pending[store]) >= self.batch_size:
+            self.flush(store)
+
+    def flush(self, store: str):
+        from app.core.vector_store import vector_store_manager, video_store_manager
+        from app.services.cleanup_temp import commit_video_frames, discard_video_frames
+
+        batch = self.pending[store]
+        if not batch:
+            return
+        self.pending[store] = []
+        manager = video_store_manager if store == "video" else vector_store_manager
+        try:
+            stats = manager.index_sources(
+                [(item["source_id"], item["type"], item["name"], item["items"]) for item in batch]
+            )
+        except Exception as e:
+            logger.exception(f"Failed to write a batch of {len(batch)} source(s): {e}")
+            for item in batch:
+                if store == "video":
+                    discard_video_frames(item["items"])
+                self.fail(item, e)
+            return
+
+        if store == "video":
+            # Staged frames replace the old ones only now that they are indexed
+            for item in batch:
+                commit_video_frames(item["source_id"], item["items"])
+
+        count_key = "frames" if store == "video" else "chunks"
+        for item in batch:
+            self.totals["files"] += 1
+            self.totals[count_key] += len(item["items"])
+            self.checkpoint.record(
+                item,
+                "done",
+                source_id=item["source_id"],
+                **{count_key: len(item["items"])},
+                **stats[item["source_id"]],
+            )
+
+    def flush_all(self):
+        for store in list(self.pending):
+            self.flush(store)
+
+    def fail(self, entry: dict, error: Exception):
+        self.totals["errors"] += 1
+        self.checkpoint.record(entry, "error", error=str(error))
+
+
+def run(
+    target: str,
+    workers: int = 4,
+    batch_size: int = 512,
+    checkpoint_path: str = "ingest_checkpoint.jsonl",
+) -> dict:
+    inputs = discover_inputs(target)
+    checkpoint = Checkpoint(checkpoint_path)
+    todo = [entry for entry in inputs if not checkpoint.is_done(entry)]
+    logger.info(
+        f"Found {len(inputs)} inputs, {len(inputs) - len(todo)} already ingested, {len(todo)} to go."
+    )
+
+    writer = BatchWriter(checkpoint, batch_size)
+    start = time.perf_counter()
+    try:
+        # Spawned (not forked) workers: the parent already runs Chroma and model threads
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as processes, ThreadPoolExecutor(max_workers=workers) as threads:
+
+            def submit(entry: dict):
+                entry = {**entry, "source_id": SourceRegistry.make_source_id(entry["type"], entry["name"])}
+                if entry["type"] == "pdf":
+                    future = processes.submit(extract_pdf_file, entry["path"], entry["name"])
+                else:
+                    future = threads.submit(extract, entry)
+                pending[future] = entry
+
+            pending = {}
+            queue = iter(todo)
+            # Keep a bounded number of extractions in flight so memory stays flat
+            for entry in queue:
+                submit(entry)
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry = pending.pop(future)
+                    try:
+                        writer.add({**entry, "items": future.result()})
+                    except Exception as e:
+                        logger.warning(f"Failed to ingest {entry['path']}: {e}")
+                        writer.fail(entry, e)
+                    next_entry = next(queue, None)
+                    if next_entry is not None:
+                        submit(next_entry)
+        writer.flush_all()
+    finally:
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    totals = writer.totals
+    return {
+        "inputs": len(inputs),
+        "skipped": len(inputs) - len(todo),
+        **totals,
+        "elapsed_s": round(elapsed, 2),
+        "files_per_s": round(totals["files"] / elapsed, 3) if elapsed else 0.0,
+        "chunks_per_s": round(totals["chunks"] / elapsed, 3) if elapsed else 0.0,
+        "frames_per_s": round(totals["frames"] / elapsed, 3) if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("target", help="Directory to walk, or a .txt/.jsonl manifest.")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel extraction processes (PDFs) and threads (videos, URLs).")
+    parser.add_argument(
+        "--batch-size", type=int, default=512, help="Chunks/frames buffered per vector store flush."
+    )
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.jsonl")
+    args = parser.parse_args(argv)
+
+    stats = run(args.target, args.workers, args.batch_size, args.checkpoint)
+    print(
+        f"Ingested {stats['files']} files ({stats['skipped']} skipped, {stats['errors']} errors) "
+        f"in {stats['elapsed_s']}s: {stats['files_per_s']} files/s, "
+        f"{stats['chunks_per_s']} chunks/s, {stats['frames_per_s']} frames/s"
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,51 @@
-from typing import List
+from typing import List, Optional
+import secrets
 import tempfile
+import time
 import uvicorn
-from fastapi import FastAPI, File, HTTPException, UploadFile,BackgroundTasks
+from fastapi import FastAPI, File, Header, HTTPException, Request, UploadFile,BackgroundTasks
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import aiofiles
 
 from app.core.config import settings
-from app.core.vector_store import vector_store_manager
+from app.core.embedding_migration import migration_status, start_migration
+from app.core.embeddings import text_collection_state
+from app.core.metrics import (
+    HTTP_DURATION,
+    is_valid_trace_id,
+    metrics,
+    new_trace_id,
+    reset_trace_id,
+    set_trace_id,
+)
+from app.core.profiling import profiler
+from app.core.source_registry import SourceRegistry, source_registry
+from app.core.vector_store import vector_store_manager, video_store_manager
 from app.models.schemas import (
+    ChatBatchRequest,
+    ChatBatchResult,
     ChatRequest,
     ChatResponse,
+    EmbeddingMigrationRequest,
     IndexResponse,
     IndexUrlRequest,
+    SourceInfo,
+    SourceListResponse,
 )
 from app.services.agent_service import agent_service
 from app.services.pdf_service import pdf_service
 from app.services.search_service import search_service
-from app.services.cleanup_temp import process_video_heavy_lifting,cleanup_temporary_file
+from app.services.cleanup_temp import (
+    process_video_heavy_lifting,
+    cleanup_temporary_file,
+    delete_video_frames,
+)
+
+
 
 
+# Requests that are profiled inline; video jobs profile themselves in the background
+PROFILED_ROUTES = {"/chat": "chat", "/index/pdfs": "pdf"}
 
 
 app = FastAPI(
@@ -27,6 +55,127 @@ app = FastAPI(
 )
 
 
+def is_profile_admin(token: Optional[str]) -> bool:
+    """Profiling stays off until PROFILE_ADMIN_TOKEN is set, then needs that token."""
+    return bool(settings.PROFILE_ADMIN_TOKEN) and secrets.compare_digest(
+        token or "", settings.PROFILE_ADMIN_TOKEN
+    )
+
+
+def require_profile_admin(token: Optional[str]):
+    if not settings.PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is disabled; set PROFILE_ADMIN_TOKEN")
+    if not is_profile_admin(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.middleware("http")
+async def trace_and_time_requests(request: Request, call_next):
+    """
+    Bind a trace ID to every request (taken from X-Request-ID when the caller sends one)
+    so all log lines it produces can be correlated, and record its latency by route.
+    """
+    trace_id = request.headers.get("x-request-id", "")
+    if not is_valid_trace_id(trace_id):
+        trace_id = new_trace_id()
+    token = set_trace_id(trace_id)
+    profiler.mark_requested(
+        request.headers.get("x-profile", "").lower() in ("1", "true", "yes")
+        and is_profile_admin(request.headers.get("x-admin-token"))
+    )
+    start = time.perf_counter()
+    status = 500
+    try:
+        kind = PROFILED_ROUTES.get(request.url.path)
+        if kind is None:
+            response = await call_next(request)
+        else:
+            with profiler.maybe_profile(trace_id, kind) as profile:
+                response = await call_next(request)
+            if profile is not None:
+                response.headers["X-Profile-ID"] = profile.profile_id
+        status = response.status_code
+        response.headers["X-Request-ID"] = trace_id
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        HTTP_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
+        reset_trace_id(token)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint. Metrics are kept per worker process.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/embeddings/migrate")
+async def migrate_embeddings(request: EmbeddingMigrationRequest):
+    """
+    Re-embed the text collection with another backend in the background.
+    Queries keep using the current collection until the new one is complete.
+    """
+    try:
+        return start_migration(request.backend, request.model, force=request.force)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/embeddings")
+async def embedding_status():
+    return {"state": text_collection_state(), "migration": migration_status()}
+
+
+@app.post("/profiles/arm")
+async def arm_profiler(count: int = 1, x_admin_token: Optional[str] = Header(None)):
+    """
+    Profile the next `count` /chat, /index/pdfs or video jobs without the X-Profile header.
+    Profiles are still subject to the per-minute rate limit.
+    """
+    require_profile_admin(x_admin_token)
+    return {"armed": profiler.arm(count)}
+
+
+@app.get("/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    require_profile_admin(x_admin_token)
+    return {"profiles": profiler.list_profiles()}
+
+
+@app.get("/profiles/{request_id}")
+async def get_profile(request_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Wall-time breakdown by tool and stage for a profiled request.
+    """
+    require_profile_admin(x_admin_token)
+    summary = profiler.get_summary(request_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No profile for request {request_id}")
+    return summary
+
+
+@app.get("/profiles/{request_id}/folded", response_class=PlainTextResponse)
+async def get_profile_stacks(request_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Sampled call stacks in collapsed format, for flamegraph.pl or speedscope.
+    """
+    require_profile_admin(x_admin_token)
+    folded = profiler.get_folded(request_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"No profile for request {request_id}")
+    return PlainTextResponse(folded)
+
+
 @app.get("/")
 async def root():
     return {"message": f"Welcome to {settings.PROJECT_NAME} API"}
@@ -42,6 +191,28 @@ async def chat(request: ChatRequest):
     return ChatResponse(response=response)
 
 
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Answer many independent messages. Retrieval for the whole batch shares one embedding
+    call and one vector store query; answers are streamed back as JSON lines
+    (`{"index", "response", "error"}`) in the order they complete.
+    """
+    if len(request.messages) > settings.CHAT_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch holds at most {settings.CHAT_BATCH_MAX_MESSAGES} messages.",
+        )
+
+    async def results():
+        async for result in agent_service.chat_batch(
+            request.messages, request.thread_id or "default", request.concurrency
+        ):
+            yield ChatBatchResult(**result).model_dump_json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @app.post("/index/pdfs", response_model=IndexResponse)
 async def upload_pdfs(files: List[UploadFile] = File(...)):
     """
@@ -85,50 +256,184 @@ async def index_url(request: IndexUrlRequest):
                 summary=None,
             )
 
-        vector_store_manager.add_documents(docs)
-        return IndexResponse(
-            status="success",
-            message=f"Successfully indexed content from {request.url}",
-            summary={request.url: f"Indexed {len(docs)} chunks."},
-        )
+        return _index_url_documents(request.url, docs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _index_url_documents(url: str, docs, source_id: Optional[str] = None) -> IndexResponse:
+    source_id = source_id or SourceRegistry.make_source_id("web", url)
+    stats = vector_store_manager.index_source(source_id, "web", url, documents=docs)
+    return IndexResponse(
+        status="success",
+        message=f"Successfully indexed content from {url}",
+        summary={
+            url: (
+                f"Indexed {len(docs)} chunks (source {source_id}: {stats['added']} added, "
+                f"{stats['deleted']} removed, {stats['unchanged']} unchanged, "
+                f"{stats['duplicates']} near-duplicates skipped)."
+            )
+        },
+    )
+
+
+async def _save_upload_to_temp(file: UploadFile) -> str:
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}")
+    tmp_file.close()
+    # Async chunked writing for large files
+    # This prevents the server from freezing while saving a 500MB video
+    try:
+        async with aiofiles.open(tmp_file.name, 'wb') as out_file:
+            # Read in 1MB chunks
+            while content := await file.read(1024 * 1024):
+                await out_file.write(content)
+    except Exception:
+        cleanup_temporary_file(tmp_file.name)
+        raise
+    return tmp_file.name
+
+
 @app.post("/index/video")
 async def upload_video(
-    background_tasks: BackgroundTasks, 
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...)
 ):
     # 1. Validate the file type
     if not file.content_type.startswith("video/"):
         return {"error": "Invalid file type. Please upload a video."}
 
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}")
-    tmp_file_path = tmp_file.name
+    name = file.filename
+    source_id = SourceRegistry.make_source_id("video", name)
+    tmp_file_path = None
 
     try:
-        # 2. Async chunked writing for large files
-        # This prevents the server from freezing while saving a 500MB video
-        async with aiofiles.open(tmp_file_path, 'wb') as out_file:
-            # Read in 1MB chunks
-            while content := await file.read(1024 * 1024):  
-                await out_file.write(content)
+        # 2. Save the upload without blocking the event loop
+        tmp_file_path = await _save_upload_to_temp(file)
 
         # 3. Schedule the heavy processing as a background task
         # Do NOT await the heavy processing here, or the request will time out
-        background_tasks.add_task(process_video_heavy_lifting, tmp_file_path)
+        background_tasks.add_task(process_video_heavy_lifting, tmp_file_path, name, source_id)
         
         # 4. Schedule cleanup to happen AFTER processing is done
         background_tasks.add_task(cleanup_temporary_file, tmp_file_path)
 
         return {
             "filename": file.filename,
+            "source_id": source_id,
             "status": "Video uploaded successfully and is now processing in the background."
         }
 
     except Exception as e:
-        background_tasks.add_task(cleanup_temporary_file, tmp_file_path)
+        if tmp_file_path:
+            background_tasks.add_task(cleanup_temporary_file, tmp_file_path)
         return HTTPException(status_code=500, detail=str(e))
 
+
+@app.get("/sources", response_model=SourceListResponse)
+async def list_sources():
+    """
+    List every indexed source with the number of chunks or frames it owns.
+    """
+    return SourceListResponse(
+        sources=[SourceInfo(**source) for source in source_registry.list_sources()]
+    )
+
+
+@app.delete("/sources/{source_id}")
+async def delete_source(source_id: str):
+    """
+    Delete a source and all of its chunks or frames from the vector store.
+    """
+    source = source_registry.get_source(source_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source_id}")
+
+    if source["source_type"] == "video":
+        deleted = video_store_manager.delete_source(source_id)
+        delete_video_frames(source_id)
+    else:
+        deleted = vector_store_manager.delete_source(source_id)
+    return {"source_id": source_id, "status": "deleted", "deleted_items": deleted}
+
+
+@app.put("/sources/{source_id}")
+async def reindex_source(
+    source_id: str,
+    background_tasks: BackgroundTasks,
+    file: Optional[UploadFile] = File(None),
+):
+    """
+    Incrementally re-index an existing source.
+    Webpages are fetched again; PDFs and videos need the new file to be uploaded.
+    Only chunks or frames whose content hash changed are embedded, inserted or deleted.
+    """
+    source = source_registry.get_source(source_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source_id}")
+
+    source_type, name = source["source_type"], source["name"]
+    if source_type == "web":
+        docs = await search_service.fetch_and_parse_webpage(name)
+        if not docs:
+            raise HTTPException(
+                status_code=502, detail=f"No content could be extracted from {name}"
+            )
+        return _index_url_documents(name, docs, source_id)
+
+    if file is None:
+        raise HTTPException(
+            status_code=400, detail=f"Re-indexing a {source_type} source requires a file upload"
+        )
+
+    if source_type == "pdf" and not (
+        file.content_type == "application/pdf" or (file.filename or "").lower().endswith(".pdf")
+    ):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+    if source_type == "video" and not (file.content_type or "").startswith("video/"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video.")
+
+    if source_type == "pdf":
+        content = await file.read()
+        try:
+            stats = await pdf_service.index_pdf(content, name, source_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return IndexResponse(
+            status="success",
+            message=f"Re-indexed {name}.",
+            summary={
+                name: (
+                    f"{stats['added']} added, {stats['deleted']} removed, "
+                    f"{stats['unchanged']} unchanged, {stats['duplicates']} near-duplicates skipped."
+                )
+            },
+        )
+
+    tmp_file_path = await _save_upload_to_temp(file)
+    background_tasks.add_task(process_video_heavy_lifting, tmp_file_path, name, source_id)
+    background_tasks.add_task(cleanup_temporary_file, tmp_file_path)
+    return {
+        "filename": name,
+        "source_id": source_id,
+        "status": "Video uploaded successfully and is now re-indexing in the background."
+    }
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    if settings.API_WORKERS > 1 and settings.CHROMA_MODE != "http":
+        raise SystemExit(
+            "API_WORKERS > 1 requires CHROMA_MODE=http: an embedded persistent store "
+            "cannot be shared safely between processes."
+        )
+    if settings.API_WORKERS > 1 and settings.FRAME_INDEX_QUANTIZATION != "none":
+        raise SystemExit(
+            "API_WORKERS > 1 requires FRAME_INDEX_QUANTIZATION=none: the compact frame index "
+            "is a set of local files that only one process may write."
+        )
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        # Auto-reload only makes sense for a single development worker
+        reload=settings.API_WORKERS == 1,
+        workers=settings.API_WORKERS,
+    )
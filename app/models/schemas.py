@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -22,6 +22,30 @@ class ChatResponse(BaseModel):
     response: str = Field(..., description="The AI agent's response message.")
 
 
+class ChatBatchRequest(BaseModel):
+    """
+    Schema for answering many independent messages in one request.
+    """
+
+    messages: List[str] = Field(..., min_length=1, description="Questions to answer independently.")
+    thread_id: Optional[str] = Field(
+        "default", description="Thread ID prefix; message i runs in thread '<thread_id>:<i>'."
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Agent runs in flight at once (default and upper bound CHAT_BATCH_CONCURRENCY)."
+    )
+
+
+class ChatBatchResult(BaseModel):
+    """
+    Schema for one answer of a batch, streamed as a JSON line when it completes.
+    """
+
+    index: int = Field(..., description="Position of the message in the request.")
+    response: Optional[str] = Field(None, description="The AI agent's response message.")
+    error: Optional[str] = Field(None, description="Why this message failed, if it did.")
+
+
 class IndexUrlRequest(BaseModel):
     """
     Schema for indexing a specific URL.
@@ -40,3 +64,33 @@ class IndexResponse(BaseModel):
     summary: Optional[Dict[str, str]] = Field(
         None, description="Summary of chunks indexed per file/source."
     )
+
+
+class SourceInfo(BaseModel):
+    """
+    Schema describing an indexed source (PDF, webpage or video).
+    """
+
+    source_id: str = Field(..., description="Stable identifier of the source.")
+    source_type: str = Field(..., description="One of 'pdf', 'web' or 'video'.")
+    name: str = Field(..., description="Filename or URL the source was indexed from.")
+    updated_at: float = Field(..., description="Unix time of the last (re-)index.")
+    item_count: int = Field(..., description="Number of chunks or frames stored.")
+
+
+class EmbeddingMigrationRequest(BaseModel):
+    """
+    Schema for re-embedding the text collection with another backend.
+    """
+
+    backend: str = Field(..., description="One of 'openai', 'local' or 'hashing'.")
+    model: Optional[str] = Field(None, description="Model name, for backends that take one.")
+    force: bool = Field(False, description="Restart a migration that was interrupted.")
+
+
+class SourceListResponse(BaseModel):
+    """
+    Schema for listing indexed sources.
+    """
+
+    sources: List[SourceInfo] = Field(default_factory=list)
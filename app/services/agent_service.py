@@ -1,4 +1,8 @@
-from langchain_core.messages import HumanMessage
+import asyncio
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
@@ -6,12 +10,15 @@ from langgraph.prebuilt import create_react_agent
 from pydantic import SecretStr
 import logging
 from app.core.config import settings
+from app.core.metrics import metrics_callback, timed
+from app.core.vector_store import vector_store_manager, video_store_manager
+from app.services.search_service import search_service
 import base64
 import cv2
 from app.tools.browse_tool import browse_webpage
-from app.tools.retrieval_tool import retrieve_from_vector_store
-from app.tools.web_search_tool import search_the_internet
-from app.tools.video_retrieval_tool import retrieve_video_content_from_vector_store
+from app.tools.retrieval_tool import format_retrieved_documents, retrieve_from_vector_store
+from app.tools.web_search_tool import format_search_results, search_the_internet
+from app.tools.video_retrieval_tool import format_video_frames, retrieve_video_content_from_vector_store
 
 
 class AgentService:
@@ -51,7 +58,9 @@ class AgentService:
             "3. browse_webpage: Use this to visit a specific URL, parse its content, and extract information directly.\n\n"
             "4. retrieve_video_content_from_vector_store: Use this when query related to an video that have been uploaded or indexed locally.\n\n"
             "Always try to provide accurate, concise, and helpful answers. "
-            "If you use a tool, cite the source information provided in the tool output."
+            "If you use a tool, cite the source information provided in the tool output. "
+            "Results of an automatic lookup may already be in the conversation; answer from "
+            "them when they are sufficient, otherwise call a tool."
         )
 
         # Create the LangGraph ReAct agent
@@ -77,24 +86,116 @@ class AgentService:
     #     except Exception as e:
     #         return f"Agent encountered an error: {str(e)}"
 
-    async def chat(self, message: str, thread_id: str = "default"):
+    @staticmethod
+    def _pre_retrieval_branches() -> List[str]:
+        return [
+            branch.strip()
+            for branch in settings.PRERETRIEVAL_BRANCHES.split(",")
+            if branch.strip() in ("text", "frames", "web")
+        ]
 
-      
-        video_keywords = ["video", "frame", "clip", "scene", "timestamp"]
+    def _start_pre_retrieval(self, message: str) -> Dict[str, asyncio.Task]:
+        """
+        Launch every configured retrieval branch for `message` at once, before it is known
+        which of them the answer will need. Each branch runs in a worker thread.
+        """
 
-        if any(word in message.lower() for word in video_keywords):
-            logging.info("Sending to VLM...")
-            tool_output, retrieved_docs = retrieve_video_content_from_vector_store.func(message)
+        def run(branch: str, search, *args):
+            with timed("agent", f"pre_retrieval_{branch}"):
+                return search(*args)
 
-            # Build proper multimodal message for Ollama
-            image_data_list = []
-            for path, meta in zip(retrieved_docs['uris'][0], retrieved_docs['metadatas'][0]):
-                image_data_list.append({'path': path, 'timestamp': meta['timestamp']})
+        searches = {
+            "text": (vector_store_manager.similarity_search, message, 2),
+            "frames": (video_store_manager.similarity_search, message, 1),
+            # get_web_context is cached, so a later search_the_internet call for the same
+            # question is free
+            "web": (lambda query: asyncio.run(search_service.get_web_context(query)), message),
+        }
+        return {
+            branch: asyncio.create_task(asyncio.to_thread(run, branch, *searches[branch]))
+            for branch in self._pre_retrieval_branches()
+        }
 
-            
+    @staticmethod
+    async def _collect_pre_retrieval(tasks: Dict[str, asyncio.Task], wanted: List[str]) -> dict:
+        """
+        Wait up to PRERETRIEVAL_TIMEOUT_S for the `wanted` branches and cancel the rest
+        (the VLM path only looks at frames, so its text and web branches never start).
+        Branches that fail or run late are left out; the agent can still call the tool.
+        A branch whose thread already started finishes in the background, its result unused.
+        """
+        for branch, task in tasks.items():
+            if branch not in wanted and not task.cancel():
+                task.exception()  # already finished; a failure in an unused branch is moot
+        pending = [tasks[branch] for branch in wanted if branch in tasks]
+        if not pending:
+            return {}
+        await asyncio.wait(pending, timeout=settings.PRERETRIEVAL_TIMEOUT_S)
 
-            content = [{"type": "text", "text": f"Question: {message}\nAnswer based ONLY on the video frames below."}]
-            
+        results = {}
+        for branch in wanted:
+            task = tasks.get(branch)
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+                logging.info(f"Pre-retrieval branch '{branch}' timed out; leaving it to the agent.")
+            elif task.exception() is not None:
+                logging.warning(f"Pre-retrieval branch '{branch}' failed: {task.exception()}")
+            else:
+                results[branch] = task.result()
+        return results
+
+    @staticmethod
+    def _pre_retrieved_messages(message: str, results: dict) -> List[BaseMessage]:
+        """
+        Present pre-retrieved context as tool calls the agent already made, so its first
+        LLM call can answer instead of asking for the same lookup.
+        """
+        calls = []
+        if results.get("text"):
+            calls.append(
+                ("retrieve_from_vector_store", format_retrieved_documents(results["text"]))
+            )
+        if results.get("frames") and results["frames"]["ids"][0]:
+            calls.append(
+                ("retrieve_video_content_from_vector_store", format_video_frames(message, results["frames"]))
+            )
+        if results.get("web") and not results["web"][0].page_content.startswith("Search failed:"):
+            calls.append(("search_the_internet", format_search_results(message, results["web"])))
+        if not calls:
+            return []
+
+        ids = [f"call_{uuid.uuid4().hex[:12]}" for _ in calls]
+        request = AIMessage(
+            content="",
+            tool_calls=[
+                {"name": name, "args": {"query": message}, "id": call_id}
+                for (name, _), call_id in zip(calls, ids)
+            ],
+        )
+        return [request] + [
+            ToolMessage(content=content, name=name, tool_call_id=call_id)
+            for (name, content), call_id in zip(calls, ids)
+        ]
+
+    @staticmethod
+    def _is_video_question(message: str) -> bool:
+        video_keywords = ["video", "frame", "clip", "scene", "timestamp"]
+        return any(word in message.lower() for word in video_keywords)
+
+    async def _answer_from_frames(self, message: str, retrieved_docs) -> str:
+        """
+        Answer a video question with the VLM, looking at the retrieved frames.
+        """
+        # Build proper multimodal message for Ollama
+        image_data_list = []
+        for path, meta in zip(retrieved_docs['uris'][0], retrieved_docs['metadatas'][0]):
+            image_data_list.append({'path': path, 'timestamp': meta['timestamp']})
+
+        content = [{"type": "text", "text": f"Question: {message}\nAnswer based ONLY on the video frames below."}]
+
+        with timed("agent", "encode_frames"):
             for item in image_data_list:
                 img = cv2.imread(item['path'])
                 if img is None:
@@ -108,16 +209,102 @@ class AgentService:
                     "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
                 })
 
-            response = self.vlm_model.invoke([HumanMessage(content=content)])
-            return response.content
-        config = {"configurable": {"thread_id": thread_id}}
+        response = await self.vlm_model.ainvoke(
+            [HumanMessage(content=content)], config={"callbacks": [metrics_callback]}
+        )
+        return response.content
+
+    async def _run_agent(self, message: str, thread_id: str, results: dict) -> str:
+        config = {"configurable": {"thread_id": thread_id}, "callbacks": [metrics_callback]}
         result = await self.agent_executor.ainvoke(
-            {"messages": [HumanMessage(content=message)]},
+            {"messages": [HumanMessage(content=message)] + self._pre_retrieved_messages(message, results)},
             config=config
         )
 
         return result["messages"][-1].content
 
+    async def chat(self, message: str, thread_id: str = "default"):
+
+        # Retrieval starts before routing, so whichever path runs finds its context ready
+        pre_retrieval = self._start_pre_retrieval(message)
+
+        if self._is_video_question(message):
+            logging.info("Sending to VLM...")
+            results = await self._collect_pre_retrieval(pre_retrieval, ["frames"])
+            if "frames" in results:
+                retrieved_docs = results["frames"]
+            else:
+                tool_output, retrieved_docs = retrieve_video_content_from_vector_store.func(message)
+            return await self._answer_from_frames(message, retrieved_docs)
+
+        # The agent may need any of them, so every configured branch runs concurrently
+        results = await self._collect_pre_retrieval(pre_retrieval, ["text", "frames", "web"])
+        return await self._run_agent(message, thread_id, results)
+
+    async def chat_batch(
+        self, messages: List[str], thread_id: str = "default", concurrency: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Answer many independent messages. Retrieval is done for the whole batch up front
+        (one embedding call and one Chroma query per store), then at most `concurrency`
+        agent or VLM runs go at a time. Yields `{"index", "response", "error"}` per message
+        in completion order; a failed message does not stop the others. `concurrency` can
+        lower CHAT_BATCH_CONCURRENCY but not raise it.
+        """
+        concurrency = min(concurrency or settings.CHAT_BATCH_CONCURRENCY, settings.CHAT_BATCH_CONCURRENCY)
+        video = {i for i, message in enumerate(messages) if self._is_video_question(message)}
+        text = [i for i in range(len(messages)) if i not in video]
+
+        # Frames are searched for every message: the VLM answers from them, and the agent
+        # gets them in its first turn next to the text hits
+        with timed("agent", "batch_retrieval"):
+            text_hits, frame_hits = await asyncio.gather(
+                asyncio.to_thread(
+                    vector_store_manager.similarity_search_batch, [messages[i] for i in text], 2
+                ),
+                asyncio.to_thread(video_store_manager.similarity_search_batch, messages, 1),
+                return_exceptions=True,
+            )
+        # A failed store lookup fails the messages that depend on it, not the stream; agent
+        # messages just go without frames
+        retrieval_errors: Dict[int, str] = {}
+        for name, indices, hits in (("text", text, text_hits), ("frame", sorted(video), frame_hits)):
+            if isinstance(hits, BaseException):
+                logging.warning(f"Batch {name} retrieval failed for {len(indices)} message(s): {hits}")
+                retrieval_errors.update((i, f"Retrieval failed: {hits}") for i in indices)
+        text_hits_by_index = {} if isinstance(text_hits, BaseException) else dict(zip(text, text_hits))
+        frame_hits_by_index = {} if isinstance(frame_hits, BaseException) else dict(enumerate(frame_hits))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer(index: int) -> dict:
+            message = messages[index]
+            if index in retrieval_errors:
+                return {"index": index, "response": None, "error": retrieval_errors[index]}
+            async with semaphore:
+                try:
+                    if index in video:
+                        response = await self._answer_from_frames(message, frame_hits_by_index[index])
+                    else:
+                        response = await self._run_agent(
+                            message,
+                            f"{thread_id}:{index}",
+                            {"text": text_hits_by_index[index], "frames": frame_hits_by_index.get(index)},
+                        )
+                except Exception as e:
+                    logging.warning(f"Batch message {index} failed: {e}")
+                    return {"index": index, "response": None, "error": str(e)}
+            return {"index": index, "response": response, "error": None}
+
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(messages))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The client went away mid-stream; stop the runs that have not finished
+            for task in tasks:
+                task.cancel()
+
 
 # Global instance
 agent_service = AgentService()
@@ -1,11 +1,17 @@
 import os
+import shutil
+import uuid
+from app.core.config import settings
+from app.core.metrics import LOG_FORMAT, count_items, get_trace_id, timed
+from app.core.profiling import profiler
+from app.core.source_registry import SourceRegistry
 from app.core.vector_store import video_store_manager
 from app.services.frame_extraction import extract_frames_with_metadata
 import logging
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 logger = logging.getLogger(__name__)
@@ -21,13 +27,80 @@ def cleanup_temporary_file(filepath: str):
             print(f"Warning: Could not delete {filepath} right now.")
 
 
-def process_video_heavy_lifting(filepath: str):
+def frames_dir_for_source(source_id: str) -> str:
+    """Directory holding the extracted frames of a single video source."""
+    return os.path.join(settings.FRAMES_DIR, source_id)
+
+
+def extract_video_frames(filepath: str, source_id: str) -> list:
+    """
+    Extract a video's frames into a staging folder next to the source's frames folder.
+    Each frame's `path` points into the staging folder (read while indexing) and its `uri`
+    to where it will live once `commit_video_frames` swaps the folder in, so the current
+    frames stay untouched until the new ones are indexed. Unchanged frames hash the same
+    and are skipped by the incremental indexer.
+    Raises ValueError when no frame could be extracted (not a readable video).
+    """
+    output_dir = frames_dir_for_source(source_id)
+    staging_dir = f"{output_dir}.staging-{uuid.uuid4().hex[:8]}"
+    try:
+        with timed("ingest", "frame_extract"):
+            frames = extract_frames_with_metadata(filepath, output_dir=staging_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    if not frames:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise ValueError(f"No frames could be extracted from {filepath}")
+    count_items("ingest", "frame_extract", len(frames))
+    for frame in frames:
+        frame["uri"] = os.path.join(output_dir, os.path.basename(frame["path"]))
+    return frames
+
+
+def _staging_dir(frames: list) -> str:
+    return os.path.dirname(frames[0]["path"])
+
+
+def commit_video_frames(source_id: str, frames: list):
+    """Replace the source's frames folder with the staged one after indexing succeeded."""
+    output_dir = frames_dir_for_source(source_id)
+    retired_dir = f"{output_dir}.old-{uuid.uuid4().hex[:8]}"
+    if os.path.exists(output_dir):
+        os.rename(output_dir, retired_dir)
+    os.rename(_staging_dir(frames), output_dir)
+    shutil.rmtree(retired_dir, ignore_errors=True)
+
+
+def discard_video_frames(frames: list):
+    """Drop the staged frames of a video that failed to index."""
+    shutil.rmtree(_staging_dir(frames), ignore_errors=True)
+
+
+def process_video_heavy_lifting(filepath: str, name: str = None, source_id: str = None):
     print(f"Starting long video processing for {filepath}...")
+    name = name or os.path.basename(filepath)
+    source_id = source_id or SourceRegistry.make_source_id("video", name)
     try:
-        extracted_metadata = extract_frames_with_metadata(filepath)
-        video_store_manager.add_documents(documents=None, extracted_metadata=extracted_metadata, is_video_processing=True)
+        # Profiled when the request that scheduled this job asked for it
+        with profiler.maybe_profile(get_trace_id(), "video"):
+            extracted_metadata = extract_video_frames(filepath, source_id)
+            try:
+                stats = video_store_manager.index_source(
+                    source_id, "video", name, extracted_metadata=extracted_metadata
+                )
+            except Exception:
+                discard_video_frames(extracted_metadata)
+                raise
+            commit_video_frames(source_id, extracted_metadata)
+        logger.info(f"Indexed video {name} ({source_id}): {stats}")
     except Exception as e:
-        logger.info("Exception: ",e)
+        logger.exception(f"Exception while processing video {name}: {e}")
+
+
+def delete_video_frames(source_id: str):
+    """Remove the extracted frame images of a deleted video source."""
+    shutil.rmtree(frames_dir_for_source(source_id), ignore_errors=True)
 
     
         
@@ -0,0 +1,93 @@
+"""
+PDF to chunked Documents, without touching the vector store.
+
+Kept apart from PDFService so bulk ingestion can run it in worker processes: PyMuPDF
+is not safe to call from several threads, and the extraction holds the GIL anyway.
+Importing this module does not create the vector stores, which keeps spawned workers
+cheap to start.
+"""
+import os
+import tempfile
+from typing import List
+
+import pymupdf4llm
+from langchain_core.documents import Document
+from langchain_text_splitters import (
+    MarkdownHeaderTextSplitter,
+    RecursiveCharacterTextSplitter,
+)
+
+from app.core.metrics import count_items, timed
+
+# Headers to split on for better contextual chunking
+HEADERS_TO_SPLIT_ON = [
+    ("#", "Header 1"),
+    ("##", "Header 2"),
+    ("###", "Header 3"),
+]
+
+# Secondary splitter to ensure chunks are within LLM context window limits
+_text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=400,
+    chunk_overlap=50,
+    separators=["\n\n", "\n", ".", " ", ""],
+)
+
+
+def extract_pdf_documents(content: bytes, filename: str) -> List[Document]:
+    """
+    Converts PDF content into chunked LangChain Documents:
+    1. Saves bytes to a temporary file.
+    2. Extracts Markdown text using pymupdf4llm.
+    3. Splits text by headers and then by character count.
+    """
+    # Create a temporary file because pymupdf4llm requires a file path
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(content)
+        tmp_path = tmp_file.name
+
+    try:
+        # 1. Extract text as Markdown
+        with timed("ingest", "pdf_extract"):
+            md_output = pymupdf4llm.to_markdown(tmp_path)
+
+        # Ensure we have a string (pymupdf4llm can return list of dicts)
+        if isinstance(md_output, list):
+            md_text = "\n\n".join(
+                [
+                    str(page.get("text", ""))
+                    for page in md_output
+                    if isinstance(page, dict)
+                ]
+            )
+        else:
+            md_text = str(md_output) if md_output else ""
+
+        if not md_text.strip():
+            raise ValueError("No text could be extracted from the PDF.")
+
+        with timed("ingest", "split"):
+            # 2. Structural split based on Markdown headers
+            header_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=HEADERS_TO_SPLIT_ON)
+            header_splits = header_splitter.split_text(md_text)
+
+            # 3. Recursive split into manageable chunks
+            final_docs = _text_splitter.split_documents(header_splits)
+        count_items("ingest", "split", len(final_docs))
+
+        # Enrich metadata
+        for doc in final_docs:
+            doc.metadata["source"] = filename
+            doc.metadata["type"] = "pdf"
+
+        return final_docs
+    finally:
+        # Ensure the temporary file is deleted
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def extract_pdf_file(path: str, filename: str) -> List[Document]:
+    """Process-pool entry point: read the PDF in the worker instead of pickling its bytes."""
+    with open(path, "rb") as f:
+        return extract_pdf_documents(f.read(), filename)
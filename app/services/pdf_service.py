@@ -1,14 +1,10 @@
-import os
-import tempfile
-from typing import List
+from typing import List, Optional
 
-import pymupdf4llm
-from langchain_text_splitters import (
-    MarkdownHeaderTextSplitter,
-    RecursiveCharacterTextSplitter,
-)
+from langchain_core.documents import Document
 
+from app.core.source_registry import SourceRegistry
 from app.core.vector_store import vector_store_manager
+from app.services.pdf_extraction import extract_pdf_documents
 
 
 class PDFService:
@@ -17,74 +13,35 @@ class PDFService:
     It uses pymupdf4llm to extract Markdown content, which preserves document structure.
     """
 
-    def __init__(self):
-        # Define headers to split on for better contextual chunking
-        self.headers_to_split_on = [
-            ("#", "Header 1"),
-            ("##", "Header 2"),
-            ("###", "Header 3"),
-        ]
-        # Secondary splitter to ensure chunks are within LLM context window limits
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=400,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", ".", " ", ""],
+    def extract_documents(self, content: bytes, filename: str) -> List[Document]:
+        """
+        Converts PDF content into chunked LangChain Documents (see app.services.pdf_extraction).
+        """
+        return extract_pdf_documents(content, filename)
+
+    async def index_pdf(
+        self, content: bytes, filename: str, source_id: Optional[str] = None
+    ) -> dict:
+        """
+        Extracts a PDF and incrementally (re-)indexes it under its source ID.
+        Only chunks whose content changed since the last upload are embedded.
+        """
+        final_docs = self.extract_documents(content, filename)
+        source_id = source_id or SourceRegistry.make_source_id("pdf", filename)
+        stats = vector_store_manager.index_source(
+            source_id, "pdf", filename, documents=final_docs
         )
+        stats["source_id"] = source_id
+        stats["chunks"] = len(final_docs)
+        return stats
 
     async def process_pdf_content(self, content: bytes, filename: str) -> int:
         """
-        Processes PDF content:
-        1. Saves bytes to a temporary file.
-        2. Extracts Markdown text using pymupdf4llm.
-        3. Splits text by headers and then by character count.
-        4. Adds resulting documents to the vector store.
+        Processes PDF content and adds resulting documents to the vector store.
+        Returns the number of chunks the PDF was split into.
         """
-        # Create a temporary file because pymupdf4llm requires a file path
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
-
-        try:
-            # 1. Extract text as Markdown
-            md_output = pymupdf4llm.to_markdown(tmp_path)
-
-            # Ensure we have a string (pymupdf4llm can return list of dicts)
-            if isinstance(md_output, list):
-                md_text = "\n\n".join(
-                    [
-                        str(page.get("text", ""))
-                        for page in md_output
-                        if isinstance(page, dict)
-                    ]
-                )
-            else:
-                md_text = str(md_output) if md_output else ""
-
-            if not md_text.strip():
-                raise ValueError("No text could be extracted from the PDF.")
-
-            # 2. Structural split based on Markdown headers
-            header_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=self.headers_to_split_on
-            )
-            header_splits = header_splitter.split_text(md_text)
-
-            # 3. Recursive split into manageable chunks
-            final_docs = self.text_splitter.split_documents(header_splits)
-
-            # Enrich metadata
-            for doc in final_docs:
-                doc.metadata["source"] = filename
-                doc.metadata["type"] = "pdf"
-
-            # 4. Index in vector store
-            vector_store_manager.add_documents(final_docs)
-
-            return len(final_docs)
-        finally:
-            # Ensure the temporary file is deleted
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+        stats = await self.index_pdf(content, filename)
+        return stats["chunks"]
 
     async def upload_and_index_pdfs(self, files_to_process: List[dict]) -> dict:
         """
@@ -96,8 +53,13 @@ class PDFService:
             content = item["content"]
             filename = item["filename"]
             try:
-                num_chunks = await self.process_pdf_content(content, filename)
-                summary[filename] = f"Successfully indexed {num_chunks} chunks."
+                stats = await self.index_pdf(content, filename)
+                summary[filename] = (
+                    f"Successfully indexed {stats['chunks']} chunks "
+                    f"(source {stats['source_id']}: {stats['added']} added, "
+                    f"{stats['deleted']} removed, {stats['unchanged']} unchanged, "
+                    f"{stats['duplicates']} near-duplicates skipped)."
+                )
             except Exception as e:
                 summary[filename] = f"Error processing file: {str(e)}"
 
@@ -1,3 +1,6 @@
+import threading
+import time
+from collections import OrderedDict
 from typing import List
 from langchain_community.document_loaders import SeleniumURLLoader
 from langchain_community.tools import DuckDuckGoSearchRun
@@ -5,6 +8,7 @@ from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.core.config import settings
+from app.core.metrics import count_items, timed
 
 
 class SearchService:
@@ -18,7 +22,11 @@ class SearchService:
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000, chunk_overlap=100
         )
-        
+        # Recent web search results, so the speculative pre-retrieval and a later tool
+        # call for the same question share one DuckDuckGo request
+        self._search_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+
 
     async def search_internet(self, query: str) -> str:
         """
@@ -26,7 +34,8 @@ class SearchService:
         Returns a summary/snippet of the search results.
         """
         try:
-            return self.search_tool.run(query)
+            with timed("web", "search"):
+                return self.search_tool.run(query)
         except Exception as e:
             return f"Search failed: {str(e)}"
 
@@ -41,10 +50,13 @@ class SearchService:
             browser="chrome"
             )
 
-            docs = loader.load()
-            
+            with timed("ingest", "web_extract"):
+                docs = loader.load()
+
             # Split content into manageable chunks
-            split_docs = self.text_splitter.split_documents(docs)
+            with timed("ingest", "split"):
+                split_docs = self.text_splitter.split_documents(docs)
+            count_items("ingest", "split", len(split_docs))
             # Add metadata
             for doc in split_docs:
                 doc.metadata["source"] = url
@@ -60,6 +72,13 @@ class SearchService:
         A high-level method that searches the web and then fetches the top results
         to provide real-time context.
         """
+        key = (query.strip().lower(), max_results)
+        with self._search_cache_lock:
+            cached = self._search_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < settings.WEB_SEARCH_CACHE_TTL_S:
+                self._search_cache.move_to_end(key)
+                return list(cached[1])
+
         # In a production scenario, you might use a search API that returns URLs directly
         # For this modular example, we'll focus on the pattern of search -> fetch
         search_results = await self.search_internet(query)
@@ -67,12 +86,19 @@ class SearchService:
         # Note: DuckDuckGoSearchRun returns a string.
         # For more complex agents, we'd use DuckDuckGoSearchResults to get specific URLs.
         # Here we return the search summary as a document.
-        return [
+        docs = [
             Document(
                 page_content=search_results,
                 metadata={"source": "duckduckgo", "query": query},
             )
         ]
+        if not search_results.startswith("Search failed:"):
+            with self._search_cache_lock:
+                self._search_cache[key] = (time.monotonic(), docs)
+                self._search_cache.move_to_end(key)
+                while len(self._search_cache) > settings.WEB_SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        return list(docs)
 
 
 # Global instance
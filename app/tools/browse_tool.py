@@ -2,11 +2,14 @@ import asyncio
 
 from langchain_core.tools import tool
 
+from app.core.metrics import instrument
+from app.core.source_registry import SourceRegistry
 from app.core.vector_store import vector_store_manager
 from app.services.search_service import search_service
 
 
 @tool(response_format="content_and_artifact")
+@instrument("tool")
 def browse_webpage(url: str, index_for_later: bool = True):
     """
     Accesses a specific webpage URL, parses its content automatically, and extracts relevant information.
@@ -33,7 +36,9 @@ def browse_webpage(url: str, index_for_later: bool = True):
 
         # Optionally index the documents into our vector store
         if index_for_later:
-            vector_store_manager.add_documents(docs)
+            vector_store_manager.index_source(
+                SourceRegistry.make_source_id("web", url), "web", url, documents=docs
+            )
             indexing_status = (
                 " (This content has also been indexed to your local knowledge base.)"
             )
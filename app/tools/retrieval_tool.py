@@ -1,5 +1,6 @@
 from langchain_core.tools import tool
 from langsmith import traceable
+from app.core.metrics import LOG_FORMAT, instrument
 from app.core.vector_store import vector_store_manager
 import logging 
 
@@ -7,14 +8,28 @@ import logging
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 logger = logging.getLogger(__name__)
 
 
+def format_retrieved_documents(retrieved_docs) -> str:
+    """
+    Format knowledge base hits the way the agent sees them in a tool result.
+    """
+    formatted_documents = []
+    for i, doc in enumerate(retrieved_docs, start=1):
+        source = doc.metadata.get("source", "Unknown source")
+        doc_type = doc.metadata.get("type", "unknown")
+        formatted_doc = f"--- Document {i} (Source: {source}, Type: {doc_type}) ---\n{doc.page_content}"
+        formatted_documents.append(formatted_doc)
+    return "\n\n".join(formatted_documents)
+
+
 @tool(response_format="content_and_artifact")
 @traceable(name="Retrieval_tool")
+@instrument("tool")
 def retrieve_from_vector_store(query: str):
     """
     Search for relevant information in the internal knowledge base (PDFs and indexed web pages).
@@ -28,17 +43,10 @@ def retrieve_from_vector_store(query: str):
             message_content = f"No relevant information found in the local knowledge base for: '{query}'."
             return (message_content, [])
         
-        logger.info(f"Retrieved Docs: {retrieved_docs}")
+        logger.info(f"Retrieved {len(retrieved_docs)} document(s) from the knowledge base.")
         
         # Format the documents for the LLM
-        formatted_documents = []
-        for i, doc in enumerate(retrieved_docs, start=1):
-            source = doc.metadata.get("source", "Unknown source")
-            doc_type = doc.metadata.get("type", "unknown")
-            formatted_doc = f"--- Document {i} (Source: {source}, Type: {doc_type}) ---\n{doc.page_content}"
-            formatted_documents.append(formatted_doc)
-
-        message_content = "\n\n".join(formatted_documents)
+        message_content = format_retrieved_documents(retrieved_docs)
     
         # Return tuple: (message_content for LLM, raw documents as artifact)
         return (message_content, retrieved_docs)
@@ -4,11 +4,13 @@ import base64
 import cv2
 import os
 
+from app.core.metrics import instrument
 from app.core.vector_store import video_store_manager
 
 
 @tool
 @traceable(name="video_content_from_vector_store")
+@instrument("tool")
 def retrieve_video_content_from_vector_store(query: str):
     """
     If search content is related to video then Search for content internal Knowledge of Videos.
@@ -22,27 +24,7 @@ def retrieve_video_content_from_vector_store(query: str):
             message_content = f"No relevant information found in the local knowledge base for: '{query}'."
             return (message_content, [])
         
-        image_data_list = final_result(retrieved_docs)
-        context_info = " | ".join([f"Frame {i}: {d['timestamp']}" for i, d in enumerate(image_data_list)])
-
-        
-        
-        message_content = f"""
-        You are a vision-capable AI.
-        Frame information:
-        {context_info}
-        Question:
-        {query}
-        Answer based ONLY on the video frames.
-        """
-                
-        # for item in image_data_list:
-        #     base64_image = encode_image(item['path'])
-            # content.append({
-            #     "type": "image_url",
-            #     "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-            # })
-        message_content = message_content
+        message_content = format_video_frames(query, retrieved_docs)
 
         # Return tuple: (message_content for LLM, raw documents as artifact)
         return (message_content, retrieved_docs)
@@ -69,6 +51,23 @@ def encode_image(image_path,target_width=150):
     return base64.b64encode(buffer).decode('utf-8')
     
     
+def format_video_frames(query: str, retrieved_docs) -> str:
+    """
+    Format frame search hits the way the agent sees them in a tool result.
+    """
+    image_data_list = final_result(retrieved_docs)
+    context_info = " | ".join([f"Frame {i}: {d['timestamp']}" for i, d in enumerate(image_data_list)])
+
+    return f"""
+        You are a vision-capable AI.
+        Frame information:
+        {context_info}
+        Question:
+        {query}
+        Answer based ONLY on the video frames.
+        """
+
+
 def final_result(responses):
     
     image_data_list = []
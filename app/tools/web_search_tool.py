@@ -2,10 +2,31 @@ import asyncio
 
 from langchain_core.tools import tool
 
+from app.core.metrics import instrument
 from app.services.search_service import search_service
 
 
+def format_search_results(query: str, search_results_docs) -> str:
+    """
+    Format web search snippets the way the agent sees them in a tool result.
+    """
+    formatted_results = []
+    for i, doc in enumerate(search_results_docs, start=1):
+        source = doc.metadata.get("source", "Search Engine")
+        content = doc.page_content
+        formatted_results.append(
+            f"--- Search Result {i} (Source: {source}) ---\n{content}"
+        )
+
+    message_content = "\n\n".join(formatted_results)
+
+    # Add a note that this is live data
+    header = f"Live Search Results for: {query}\n\n"
+    return header + message_content
+
+
 @tool(response_format="content_and_artifact")
+@instrument("tool")
 def search_the_internet(query: str):
     """
     Search the internet for real-time information, news, or general knowledge.
@@ -29,20 +50,7 @@ def search_the_internet(query: str):
             return (f"No search results found for: '{query}'.", [])
 
         # Format the snippets for the LLM
-        formatted_results = []
-        for i, doc in enumerate(search_results_docs, start=1):
-            source = doc.metadata.get("source", "Search Engine")
-            content = doc.page_content
-            formatted_results.append(
-                f"--- Search Result {i} (Source: {source}) ---\n{content}"
-            )
-
-        message_content = "\n\n".join(formatted_results)
-
-        # Add a note that this is live data
-        header = f"Live Search Results for: {query}\n\n"
-
-        return (header + message_content, search_results_docs)
+        return (format_search_results(query, search_results_docs), search_results_docs)
     except Exception as e:
         error_message = f"Error performing web search: {str(e)}"
         return (error_message, [])
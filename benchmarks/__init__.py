@@ -0,0 +1 @@
+# Offline benchmarks for the ingestion and retrieval hot paths.
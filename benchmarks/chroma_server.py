@@ -0,0 +1,178 @@
+"""
+Check the shared-server setup (CHROMA_MODE=http) against a locally launched Chroma server.
+
+Starts `chroma run` on a free port, then several worker processes that each index their
+own text source and query the store at the same time, like API and ingestion workers
+would. Afterwards the server is restarted while a client keeps querying, to exercise the
+connection retries. Exits non-zero when a write goes missing or a request fails.
+
+    python -m benchmarks.chroma_server --workers 4 --docs 200
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fakes import install_fakes
+from benchmarks.run import _free_port
+
+
+def start_server(path: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        ["chroma", "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    import httpx
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/v2/heartbeat", timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Chroma server did not start within 30s")
+
+
+def use_server(workdir: str, port: int):
+    """Point the app at the scratch directory and the local server. Call before importing `app`."""
+    install_fakes(workdir)
+    os.environ["CHROMA_MODE"] = "http"
+    os.environ["CHROMA_HOST"] = "127.0.0.1"
+    os.environ["CHROMA_PORT"] = str(port)
+    os.environ["CHROMA_HTTP_RETRIES"] = "8"
+    os.environ["SOURCE_REGISTRY_PATH"] = os.path.join(workdir, "source_registry.sqlite3")
+
+
+def worker(workdir: str, port: int, index: int, n_docs: int):
+    """One worker process: index a source of `n_docs` chunks while querying."""
+    use_server(workdir, port)
+    from langchain_core.documents import Document
+
+    from app.core.vector_store import vector_store_manager
+
+    documents = [
+        Document(
+            page_content=f"worker {index} chunk {i} " + " ".join(f"w{index}t{i}x{j}" for j in range(40)),
+            metadata={"source": f"worker_{index}", "type": "pdf"},
+        )
+        for i in range(n_docs)
+    ]
+    start = time.perf_counter()
+    stats = vector_store_manager.index_source(f"pdf:worker{index}", "pdf", f"worker_{index}.pdf", documents)
+    index_s = time.perf_counter() - start
+    latencies = []
+    for i in range(50):
+        t0 = time.perf_counter()
+        vector_store_manager.similarity_search(f"worker {index} chunk {i}", k=2)
+        latencies.append(time.perf_counter() - t0)
+    print(json.dumps({"worker": index, **stats, "index_s": round(index_s, 3), "query_ms_max": round(max(latencies) * 1000, 3)}))
+
+
+def survive_restart(workdir: str, port: int, server: subprocess.Popen, server_path: str) -> tuple:
+    """Query continuously while the server is stopped and started again."""
+    use_server(workdir, port)
+    from app.core.vector_store import vector_store_manager
+
+    errors, queries = [], 0
+    stop = threading.Event()
+
+    def query_loop():
+        nonlocal queries
+        while not stop.is_set():
+            try:
+                vector_store_manager.similarity_search("worker 0 chunk 1", k=2)
+                queries += 1
+            except Exception as e:
+                errors.append(f"{e.__class__.__name__}: {e}")
+            time.sleep(0.02)
+
+    thread = threading.Thread(target=query_loop)
+    thread.start()
+    time.sleep(0.5)
+    server.terminate()
+    server.wait()
+    time.sleep(1.0)
+    server = start_server(server_path, port)
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+    return server, {"queries": queries, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--docs", type=int, default=200, help="Chunks indexed per worker.")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args.workdir, args.port, args.worker, args.docs)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="chroma_server_check_")
+    server_path = os.path.join(workdir, "server")
+    port = _free_port()
+    server = start_server(server_path, port)
+    report = {"workers": args.workers, "docs_per_worker": args.docs}
+    try:
+        start = time.perf_counter()
+        processes = [
+            subprocess.Popen(
+                [
+                    sys.executable, "-m", "benchmarks.chroma_server",
+                    "--worker", str(i), "--workdir", workdir, "--port", str(port), "--docs", str(args.docs),
+                ],
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for i in range(args.workers)
+        ]
+        outputs = [process.communicate()[0] for process in processes]
+        report["wall_s"] = round(time.perf_counter() - start, 3)
+        report["worker_results"] = [
+            json.loads(output.strip().splitlines()[-1]) if process.returncode == 0 else {"failed": process.returncode}
+            for process, output in zip(processes, outputs)
+        ]
+
+        use_server(workdir, port)
+        from app.core.chroma_client import get_chroma_client
+        from app.core.config import settings
+        from app.core.source_registry import source_registry
+
+        stored = get_chroma_client().get_collection(settings.COLLECTION_NAME).count()
+        registered = sum(source["item_count"] for source in source_registry.list_sources())
+        report["stored"] = stored
+        report["registered"] = registered
+
+        server, report["restart"] = survive_restart(workdir, port, server, server_path)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    expected = args.workers * args.docs
+    ok = (
+        all("failed" not in result for result in report["worker_results"])
+        and report["stored"] == expected
+        and report["registered"] == expected
+        and not report["restart"]["errors"]
+    )
+    if not ok:
+        print(f"FAILED: expected {expected} chunks stored and registered, and no request errors.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare two benchmark reports written by `benchmarks.run`.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+
+
+def flatten(node, prefix=""):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, node
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline['meta']['commit']}")
+    print(f"candidate: {candidate['meta']['commit']}\n")
+    old = dict(flatten(baseline["results"]))
+    new = dict(flatten(candidate["results"]))
+    width = max((len(key) for key in old.keys() | new.keys()), default=10)
+    print(f"{'metric':<{width}}  {'baseline':>12}  {'candidate':>12}  {'change':>8}")
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        if before is None or after is None:
+            change = "n/a"
+        elif before == 0:
+            change = "-"
+        else:
+            change = f"{(after - before) / before:+.1%}"
+        print(
+            f"{key:<{width}}  {before if before is not None else '-':>12}  "
+            f"{after if after is not None else '-':>12}  {change:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
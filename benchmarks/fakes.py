@@ -0,0 +1,126 @@
+"""
+Deterministic local stand-ins for the network and model dependencies, so the real hot
+paths can be benchmarked offline:
+
+- Text embeddings use the built-in "hashing" backend instead of OpenAI.
+- FakeImageEmbeddingFunction replaces OpenCLIP (texts hashed with the same
+  HashingEmbeddings, images pooled).
+- FakeChatModel replaces ChatOllama (calls the retrieval tool once, then answers).
+
+`install_fakes()` must run before any `app.*` module is imported, because the
+vector stores and agent are created at import time.
+"""
+import os
+import time
+import uuid
+from typing import Any, List, Optional
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class FakeImageEmbeddingFunction(EmbeddingFunction):
+    """
+    OpenCLIP stand-in: texts are feature-hashed, images are average-pooled into `dim` values.
+    """
+
+    def __init__(self, dim: int = 512, **_: Any):
+        # Imported here: `app` modules read their settings on import, after install_fakes
+        from app.core.embeddings import HashingEmbeddings
+
+        self.dim = dim
+        self._text = HashingEmbeddings(dim=dim)
+
+    def __call__(self, input):
+        embeddings = []
+        for item in input:
+            if isinstance(item, str):
+                embeddings.append(np.asarray(self._text.embed_query(item), dtype=np.float32))
+                continue
+            pixels = np.asarray(item, dtype=np.float32).ravel()
+            pooled = np.array([chunk.mean() for chunk in np.array_split(pixels, self.dim)], dtype=np.float32)
+            pooled -= pooled.mean()
+            norm = np.linalg.norm(pooled)
+            embeddings.append(pooled / norm if norm else pooled)
+        return embeddings
+
+    @staticmethod
+    def name() -> str:
+        return "benchmark_fake_image"
+
+    def get_config(self):
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config):
+        return FakeImageEmbeddingFunction(**config)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model stand-in with a fixed per-call latency. When the retrieval tool is bound it
+    behaves like a ReAct agent's common path: one tool call, then a final answer.
+    """
+
+    latency_s: float = 0.0
+    tool_name: str = "retrieve_from_vector_store"
+    bound_tools: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(tool, "name", None) or getattr(tool, "__name__", str(tool)) for tool in tools]
+        return self.model_copy(update={"bound_tools": names})
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        question = next(
+            (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+        )
+        if self.tool_name in self.bound_tools and not any(isinstance(m, ToolMessage) for m in messages):
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": self.tool_name,
+                        "args": {"query": question if isinstance(question, str) else str(question)},
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                    }
+                ],
+            )
+        else:
+            context_chars = sum(len(str(m.content)) for m in messages if isinstance(m, ToolMessage))
+            message = AIMessage(content=f"Answer drawn from {context_chars} characters of context.")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def install_fakes(workdir: str, llm_latency_s: float = 0.0, text_dim: int = 384, image_dim: int = 512):
+    """
+    Point the app at a scratch directory and swap every remote dependency for a local
+    stand-in. Must be called before importing anything from `app`.
+    """
+    os.environ["CHROMA_MODE"] = "persistent"
+    os.environ["CHROMA_DB_DIR"] = os.path.join(workdir, "chroma_db")
+    os.environ["FRAMES_DIR"] = os.path.join(workdir, "extracted_frames")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    os.environ["TEXT_EMBEDDING_BACKEND"] = "hashing"
+    os.environ["HASHING_EMBEDDING_DIM"] = str(text_dim)
+
+    import chromadb.utils.embedding_functions
+    import langchain_ollama
+    chromadb.utils.embedding_functions.OpenCLIPEmbeddingFunction = (
+        lambda **kwargs: FakeImageEmbeddingFunction(dim=image_dim)
+    )
+    langchain_ollama.ChatOllama = lambda **kwargs: FakeChatModel(latency_s=llm_latency_s)
@@ -0,0 +1,174 @@
+"""
+Compares the compact quantized frame index against a float32 Chroma collection on
+synthetic OpenCLIP-sized frame embeddings, reporting footprint, query latency and
+recall@k against exact brute-force search.
+
+    python -m benchmarks.frame_index --frames 100000 --queries 200 --k 5
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from app.core.frame_index import QuantizedFrameIndex
+
+
+def synthetic_frames(n_frames: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Clustered unit vectors: consecutive frames of a "video" drift around a shared scene
+    vector, which is closer to real frame embeddings than independent random points.
+    """
+    rng = np.random.default_rng(seed)
+    n_scenes = max(1, n_frames // 30)
+    scenes = rng.standard_normal((n_scenes, dim)).astype(np.float32)
+    vectors = scenes[np.arange(n_frames) % n_scenes] + 0.35 * rng.standard_normal(
+        (n_frames, dim)
+    ).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_queries(frames: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = frames[rng.integers(0, len(frames), n_queries)]
+    queries = picks + 0.5 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def recall_at_k(results, truth) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return hits / sum(len(t) for t in truth)
+
+
+def latency_summary(latencies) -> dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+    }
+
+
+def bench_chroma(workdir, ids, frames, queries, k, batch_size=5000) -> tuple:
+    path = os.path.join(workdir, "chroma")
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection("bench_frames")
+    uris = [f"frame_{i}.jpg" for i in range(len(ids))]
+    start = time.perf_counter()
+    for offset in range(0, len(ids), batch_size):
+        collection.add(
+            ids=ids[offset:offset + batch_size],
+            embeddings=frames[offset:offset + batch_size],
+            uris=uris[offset:offset + batch_size],
+        )
+    build_s = time.perf_counter() - start
+
+    results, latencies = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=["uris"])
+        latencies.append(time.perf_counter() - t0)
+        results.append(result["ids"][0])
+    return results, {
+        "build_s": round(build_s, 3),
+        "disk_bytes": directory_size(path),
+        **latency_summary(latencies),
+    }
+
+
+def bench_compact(workdir, quantization, ids, frames, queries, k, rerank_factor) -> tuple:
+    path = os.path.join(workdir, f"frame_index_{quantization}")
+    index = QuantizedFrameIndex(path, quantization=quantization, rerank_factor=rerank_factor)
+    uris = [f"frame_{i}.jpg" for i in range(len(ids))]
+    metadatas = [{"timestamp": f"{2 * i}s"} for i in range(len(ids))]
+    start = time.perf_counter()
+    index.add(ids, frames, uris, metadatas)
+    build_s = time.perf_counter() - start
+
+    results, latencies = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        result = index.search(query, k=k)
+        latencies.append(time.perf_counter() - t0)
+        results.append(result["ids"][0])
+    footprint = index.footprint()
+    return results, {
+        "rerank_factor": index.rerank_factor,
+        "build_s": round(build_s, 3),
+        "disk_bytes": directory_size(path),
+        "scan_bytes": footprint["scan_bytes"],
+        "rerank_bytes": footprint["rerank_bytes"],
+        **latency_summary(latencies),
+    }
+
+
+def run(n_frames=100_000, n_queries=200, dim=512, k=5, rerank_factor=None, skip_chroma=False) -> dict:
+    frames = synthetic_frames(n_frames, dim)
+    queries = synthetic_queries(frames, n_queries)
+    ids = [f"frame_{i}" for i in range(n_frames)]
+
+    # Exact brute-force ground truth
+    truth = [[ids[i] for i in np.argsort(-(frames @ q))[:k]] for q in queries]
+
+    report = {
+        "frames": n_frames,
+        "queries": n_queries,
+        "dim": dim,
+        "k": k,
+        "rerank_factor": rerank_factor,
+        "float32_vector_bytes": frames.nbytes,
+        "backends": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="frame_index_bench_")
+    try:
+        if not skip_chroma:
+            results, stats = bench_chroma(workdir, ids, frames, queries, k)
+            report["backends"]["chroma_float32"] = {"recall_at_k": recall_at_k(results, truth), **stats}
+        for quantization in ("int8", "binary"):
+            results, stats = bench_compact(
+                workdir, quantization, ids, frames, queries, k, rerank_factor
+            )
+            report["backends"][f"compact_{quantization}"] = {
+                "recall_at_k": recall_at_k(results, truth),
+                **stats,
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--rerank-factor", type=int, default=None, help="Default: 8 for int8, 128 for binary."
+    )
+    parser.add_argument("--skip-chroma", action="store_true", help="Only benchmark the compact index.")
+    parser.add_argument("--output", help="Write the JSON report to this file as well.")
+    args = parser.parse_args()
+
+    report = run(args.frames, args.queries, args.dim, args.k, args.rerank_factor, args.skip_chroma)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+End-to-end offline benchmark of the ingestion and retrieval hot paths.
+
+Every remote dependency (OpenAI, OpenCLIP, Ollama) is replaced by the deterministic
+stand-ins in benchmarks/fakes.py, and /chat is driven over HTTP against a local uvicorn
+server. Results are written as JSON so runs can be compared across commits:
+
+    python -m benchmarks.run --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.run --suites pdf,vector_store --sizes 10000,100000
+    python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.fakes import install_fakes
+
+SUITES = ("pdf", "frames", "vector_store", "frame_index", "chat", "pre_retrieval")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(latencies) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "n": len(latencies_ms),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------- suites
+
+
+def bench_pdf(repeats: int) -> dict:
+    """PDFService.process_pdf_content on the bundled document.pdf (extract, split, embed, write)."""
+    from app.services.pdf_service import pdf_service
+
+    with open(os.path.join(REPO_ROOT, "document.pdf"), "rb") as f:
+        content = f.read()
+    latencies, chunks = [], 0
+    for i in range(repeats):
+        start = time.perf_counter()
+        # A new filename per run so every repeat does the full write, not an incremental no-op
+        chunks = asyncio.run(pdf_service.process_pdf_content(content, f"document_{i}.pdf"))
+        latencies.append(time.perf_counter() - start)
+    return {"bytes": len(content), "chunks": chunks, **summarize(latencies)}
+
+
+def make_synthetic_video(path: str, seconds: int, fps: int = 30, size=(640, 360)):
+    import cv2
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    width, height = size
+    for i in range(seconds * fps):
+        frame = np.full((height, width, 3), (i * 3) % 255, dtype=np.uint8)
+        x = (i * 7) % (width - 60)
+        y = (i * 3) % (height - 60)
+        cv2.rectangle(frame, (x, y), (x + 60, y + 60), (255, 128, 0), -1)
+        cv2.putText(frame, f"{i / fps:.1f}s", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+
+def bench_frames(workdir: str, seconds: int, repeats: int) -> dict:
+    """extract_frames_with_metadata on a synthetic video."""
+    from app.services.frame_extraction import extract_frames_with_metadata
+
+    video_path = os.path.join(workdir, "synthetic.mp4")
+    make_synthetic_video(video_path, seconds)
+    latencies, frames = [], 0
+    for i in range(repeats):
+        output_dir = os.path.join(workdir, f"frames_{i}")
+        start = time.perf_counter()
+        frames = len(extract_frames_with_metadata(video_path, output_dir=output_dir))
+        latencies.append(time.perf_counter() - start)
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {"video_seconds": seconds, "frames": frames, **summarize(latencies)}
+
+
+def bench_vector_store(sizes, n_queries: int, batch_size: int) -> dict:
+    """VectorStoreManager.add_documents and similarity_search at increasing collection sizes."""
+    from langchain_core.documents import Document
+
+    from app.core.config import settings
+    from app.core.vector_store import VectorStoreManager
+
+    rng = np.random.default_rng(0)
+    vocabulary = [f"term{i}" for i in range(5000)]
+
+    def text(n_words: int = 60) -> str:
+        return " ".join(rng.choice(vocabulary, n_words))
+
+    results = {}
+    for size in sizes:
+        settings.COLLECTION_NAME = f"bench_{size}"
+        manager = VectorStoreManager()
+        start = time.perf_counter()
+        for offset in range(0, size, batch_size):
+            manager.add_documents(
+                [
+                    Document(page_content=text(), metadata={"source": "bench", "type": "pdf"})
+                    for _ in range(min(batch_size, size - offset))
+                ]
+            )
+        add_s = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(n_queries):
+            query = text(8)
+            t0 = time.perf_counter()
+            manager.similarity_search(query, k=2)
+            latencies.append(time.perf_counter() - t0)
+        results[str(size)] = {
+            "add_s": round(add_s, 3),
+            "add_docs_per_s": round(size / add_s, 1),
+            "search": summarize(latencies),
+        }
+    return results
+
+
+def bench_frame_index(n_frames: int) -> dict:
+    from benchmarks import frame_index
+
+    return frame_index.run(n_frames=n_frames, n_queries=100)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_chat(concurrency_levels, requests_per_level: int) -> dict:
+    """/chat latency under concurrency, over HTTP against a local uvicorn server."""
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    async def drive(concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+
+            async def one(i: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/chat", json={"message": f"What does the document say about topic {i}?"}
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests_per_level)))
+            wall = time.perf_counter() - start
+        return {**summarize(latencies), "requests_per_s": round(requests_per_level / wall, 2)}
+
+    try:
+        return {str(level): asyncio.run(drive(level)) for level in concurrency_levels}
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def bench_pre_retrieval(n_messages: int) -> dict:
+    """
+    AgentService.chat with speculative pre-retrieval off and on. With it on, the fake model
+    finds the retrieval result in its first turn and answers without a tool call, so each
+    chat saves one LLM round trip (see --llm-latency-ms).
+    """
+    from app.core.config import settings
+    from app.services.agent_service import agent_service
+    from app.services.pdf_service import pdf_service
+
+    with open(os.path.join(REPO_ROOT, "document.pdf"), "rb") as f:
+        asyncio.run(pdf_service.process_pdf_content(f.read(), "pre_retrieval.pdf"))
+
+    async def drive() -> list:
+        latencies = []
+        for i in range(n_messages):
+            start = time.perf_counter()
+            await agent_service.chat(f"What does the document say about topic {i}?")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    branches = settings.PRERETRIEVAL_BRANCHES
+    results = {}
+    try:
+        for mode, configured in (("off", ""), ("on", "text,frames")):
+            settings.PRERETRIEVAL_BRANCHES = configured
+            results[mode] = summarize(asyncio.run(drive()))
+    finally:
+        settings.PRERETRIEVAL_BRANCHES = branches
+    results["p50_speedup"] = round(results["off"]["p50_ms"] / results["on"]["p50_ms"], 2)
+    return results
+
+
+# ---------------------------------------------------------------------------- entry point
+
+
+def parse_ints(value: str):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {SUITES}.")
+    parser.add_argument("--sizes", type=parse_ints, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--write-batch", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--video-seconds", type=int, default=60)
+    parser.add_argument("--frame-index-size", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 16])
+    parser.add_argument("--chat-requests", type=int, default=32)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per fake LLM call.")
+    parser.add_argument("--output", help="Where to write the JSON report (default: stdout only).")
+    args = parser.parse_args()
+
+    suites = [suite for suite in args.suites.split(",") if suite]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {sorted(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    install_fakes(workdir, llm_latency_s=args.llm_latency_ms / 1000)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+        "results": {},
+    }
+    try:
+        for suite in suites:
+            print(f"Running {suite}...", file=sys.stderr)
+            if suite == "pdf":
+                report["results"]["pdf"] = bench_pdf(args.repeats)
+            elif suite == "frames":
+                report["results"]["frames"] = bench_frames(workdir, args.video_seconds, args.repeats)
+            elif suite == "vector_store":
+                report["results"]["vector_store"] = bench_vector_store(args.sizes, args.queries, args.write_batch)
+            elif suite == "frame_index":
+                report["results"]["frame_index"] = bench_frame_index(args.frame_index_size)
+            elif suite == "chat":
+                report["results"]["chat"] = bench_chat(args.concurrency, args.chat_requests)
+            elif suite == "pre_retrieval":
+                report["results"]["pre_retrieval"] = bench_pre_retrieval(args.chat_requests)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()